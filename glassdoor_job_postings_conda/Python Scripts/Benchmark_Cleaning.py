@@ -0,0 +1,163 @@
+"""
+This script compares the speed of the vectorized cleaning functions in Cleaning_Glassdoor_Data.py with the original functions of
+Cleaning_Glassdoor_Data.ipynb (copied below as they are in the notebook, and run with .apply like in the notebook).
+
+The 9 csvs in "Scrapped Data" are concatenated and replicated until the dataset has the number of rows given (1,000,000 by default).
+For every cleaning step, it prints the time taken by both versions and the number of rows where their outputs differ.
+
+Usage: python Benchmark_Cleaning.py [number_of_rows] [folder of the csvs]
+"""
+
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+import Cleaning_Glassdoor_Data as vectorized
+
+#Original functions from Cleaning_Glassdoor_Data.ipynb
+def simplify_location(location):
+    if str(location).strip() == "Remote": return "Remote"
+    else: return "Singapore"
+
+def clean_age(length_of_time: str) -> str:
+    for i,c in enumerate(length_of_time):
+        if c.isalpha():
+            number = length_of_time[:i]
+            unit = length_of_time[i:]
+
+    if unit == "d": return f"{number} days"
+    elif unit == "d+": return f"{number} days +"
+    elif unit == "h": return f"{round(int(number)/24,1)} days"
+    else:
+        print("new data that does not have d,d+,h as units. Need edit code")
+        raise Exception
+
+def simplify_salary(salary_range:str) -> int:
+    lower_bound = None
+    upper_bound = None
+
+    try:
+        for word in salary_range.split(" "):
+            if word[0].isnumeric():
+                for i,c in enumerate(word):
+                    if c.isalpha():
+                        number = word[:i]
+                #update bound
+                if lower_bound == None: lower_bound = int(number)
+                else: upper_bound = int(number)
+        return (lower_bound + upper_bound)*1000/2
+
+    except AttributeError: #To catch Nan values (missing values)
+        return salary_range
+
+    except TypeError: #To catch values with no upper bound/lower bound
+        return int(lower_bound)
+
+def clean_company(name:str) -> str:
+    result = name.strip()
+    for i,c in enumerate(result):
+        if c.isnumeric():
+            return result[:i]
+
+def clean_proportion(proportion:str) -> str:
+    try:
+        return int(proportion.strip().split(" ")[0])
+    except AttributeError: #To catch Nan values (missing values)
+        return proportion
+
+def separate_individual_ratings(individual_ratings):
+    categories = ['Career Opportunities','Comp & Benefits','Culture & Values','Senior Management', 'Work/Life Balance']
+    result = {e:[] for e in categories}
+
+    def clean(obs):
+        for e in ["[", "]", "'"]:
+            obs = obs.replace(e,"")
+        obs = list(filter(lambda e: e != " ",obs.split(",")))
+        obs = [e.strip() for e in obs]
+        return obs
+
+    def not_float(e):
+        try:
+            float(e)
+            return False
+        except:
+            return True
+
+    def insert_na_row_to_result():
+        for e in result: result[e].append(None)
+
+    for obs in individual_ratings:
+        categories_encountered = []
+        if obs == "[]":
+            insert_na_row_to_result()
+            continue
+        try:
+            cleaned_obs = clean(obs)
+        except AttributeError:
+            insert_na_row_to_result()
+            continue
+
+        for index,element in enumerate(cleaned_obs):
+            if not not_float(element): continue
+            else:
+                category = element
+                score = float(cleaned_obs[index + 1])
+                result[category].append(score)
+                categories_encountered.append(category)
+
+        for c in categories:
+            if c not in categories_encountered:
+                result[c].append(None)
+    return result
+#End of original functions
+
+def load_replicated_dataset(directory: str, number_of_rows: int) -> pd.DataFrame:
+    df = vectorized.load_extracted_data(directory).drop(columns = ["Unnamed: 0"],errors = "ignore")
+    df = pd.concat([df]*(number_of_rows//len(df) + 1),ignore_index = True).iloc[:number_of_rows]
+    return df
+
+def number_of_differences(original: pd.Series, new: pd.Series) -> int:
+    original = pd.Series(original,index = new.index)
+    both_missing = original.isna() & new.isna()
+    if pd.api.types.is_numeric_dtype(new):
+        same = np.isclose(pd.to_numeric(original).astype(float),new.astype(float))
+    else:
+        same = original.astype(str) == new.astype(str)
+    return int((~(same | both_missing)).sum())
+
+def time_it(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+if __name__ == '__main__':
+    number_of_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    directory = sys.argv[2] if len(sys.argv) > 2 else f"{os.path.dirname(os.path.abspath(__file__))}/../Scrapped Data"
+    df = load_replicated_dataset(directory,number_of_rows)
+    companies = df["company"].dropna()
+    print(f"Benchmarking on {len(df)} rows\n")
+
+    steps = [("simplify_location", lambda: df["job_location"].apply(simplify_location), lambda: vectorized.simplify_location(df["job_location"])),
+             ("clean_age", lambda: df["job_age"].apply(clean_age), lambda: vectorized.clean_age(df["job_age"])),
+             ("simplify_salary", lambda: df["job_salary_range"].apply(simplify_salary), lambda: vectorized.simplify_salary(df["job_salary_range"])),
+             ("clean_company", lambda: companies.apply(clean_company), lambda: vectorized.clean_company(companies)),
+             ("clean_proportion", lambda: df["proportion_reviewers_recommend_company"].apply(clean_proportion),\
+              lambda: vectorized.clean_proportion(df["proportion_reviewers_recommend_company"]))]
+
+    print(f"{'step':<30}{'notebook (s)':>14}{'vectorized (s)':>16}{'speedup':>10}{'rows differ':>13}")
+    total_original, total_vectorized = 0, 0
+    for name, original_step, vectorized_step in steps:
+        original, original_seconds = time_it(original_step)
+        new, vectorized_seconds = time_it(vectorized_step)
+        total_original, total_vectorized = total_original + original_seconds, total_vectorized + vectorized_seconds
+        print(f"{name:<30}{original_seconds:>14.3f}{vectorized_seconds:>16.3f}{original_seconds/vectorized_seconds:>9.1f}x{number_of_differences(original,new):>13}")
+
+    original, original_seconds = time_it(separate_individual_ratings,df["company_individual_ratings"])
+    new, vectorized_seconds = time_it(vectorized.separate_individual_ratings,df["company_individual_ratings"])
+    total_original, total_vectorized = total_original + original_seconds, total_vectorized + vectorized_seconds
+    differences = sum(number_of_differences(original[category],new[category]) for category in new)
+    print(f"{'separate_individual_ratings':<30}{original_seconds:>14.3f}{vectorized_seconds:>16.3f}{original_seconds/vectorized_seconds:>9.1f}x{differences:>13}")
+    print(f"{'total':<30}{total_original:>14.3f}{total_vectorized:>16.3f}{total_original/total_vectorized:>9.1f}x")
+    print("\nsimplify_salary and clean_company differ on purpose for single salaries and companies without a rating "\
+          "(see Cleaning_Glassdoor_Data.py)")
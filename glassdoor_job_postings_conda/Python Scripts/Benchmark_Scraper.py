@@ -0,0 +1,194 @@
+"""
+This script measures the throughput of the scrapers against WS_Replay_Server.py, a local copy of glassdoor serving the job postings in
+"Scrapped Data", so that tuning changes can be compared without network and without hitting glassdoor.
+
+For every engine given, it prints:
+
+# 1. The number of job postings scraped, the time taken, and postings/sec (the time to start and login is included)
+# 2. The peak RSS of the whole process tree (this process, the worker processes, chromedriver and chrome), sampled every 0.1s
+# 3. The p50, p95 and p99 latency of every stage: the wait sites of GlassdoorDriver (see WaitProfile), or the listing page and job
+#    posting fetches of the http engine (including the time waiting for a free connection)
+
+Engines:
+# "http": GlassdoorHttpClient (WS_Glassdoor_Http.py) with max_connections connections. Does not need chrome.
+# "selenium": A single GlassdoorDriver scraping every page of every search one after the other
+# "pool": iter_scrape_pool (WS_multiprocessing_jobs_locations.py) with the number of workers given
+
+The selenium engines need chromedriver in the current working directory, like the rest of the scripts.
+Every run is also appended to benchmark_results.csv, so that results can be compared across changes.
+
+Usage: python Benchmark_Scraper.py --engines http pool --workers 4 --latency 0.2 --jitter 0.1 --failure-rate 0.02
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import datetime
+import threading
+import numpy as np
+import pandas as pd
+import WS_Glassdoor_Driver
+from WS_Glassdoor_Driver import WaitProfile, start_glassdoor_driver
+from WS_Glassdoor_Http import GlassdoorHttpClient
+from WS_Rate_Limiter import RequestBudget
+from WS_Replay_Server import ReplayServer
+
+class PeakRssSampler:
+    #Samples the total RSS of this process and all its descendants in a background thread (linux only, reads /proc)
+    def __init__(self,interval_seconds: float = 0.1):
+        self.interval_seconds = interval_seconds
+        self.peak_bytes = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target = self.run,daemon = True)
+        self.page_size = os.sysconf("SC_PAGE_SIZE")
+
+    def process_tree_rss(self) -> int:
+        parents = {}
+        for pid in filter(str.isdigit,os.listdir("/proc")):
+            try:
+                with open(f"/proc/{pid}/stat") as f:
+                    parents[int(pid)] = int(f.read().rsplit(")",1)[1].split()[1])
+            except (OSError,IndexError,ValueError):
+                continue
+        tree, added = {os.getpid()}, True
+        while added:
+            children = {pid for (pid,parent) in parents.items() if parent in tree} - tree
+            tree |= children
+            added = bool(children)
+        total = 0
+        for pid in tree:
+            try:
+                with open(f"/proc/{pid}/statm") as f:
+                    total += int(f.read().split()[1])*self.page_size
+            except (OSError,IndexError,ValueError):
+                continue
+        return total
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.peak_bytes = max(self.peak_bytes,self.process_tree_rss())
+            self.stopped.wait(self.interval_seconds)
+
+    def __enter__(self):
+        if os.path.exists("/proc"): self.thread.start()
+        return self
+
+    def __exit__(self,*exc_info):
+        self.stopped.set()
+        if self.thread.is_alive(): self.thread.join()
+
+class TimedHttpClient(GlassdoorHttpClient):
+    #Records how long every fetch took (including retries) into a WaitProfile, as "listing-fetch" or "job-posting-fetch"
+    def __init__(self,*args, wait_profile: WaitProfile, **kwargs):
+        super().__init__(*args,**kwargs)
+        self.wait_profile = wait_profile
+
+    async def fetch(self,url: str, retries: int = 3):
+        start = time.perf_counter()
+        site = "job-posting-fetch" if "/job-listing/" in url else "listing-fetch"
+        try:
+            selector = await super().fetch(url,retries)
+        except Exception as e:
+            self.wait_profile.record(site,time.perf_counter() - start,True)
+            raise e
+        self.wait_profile.record(site,time.perf_counter() - start,False)
+        return selector
+
+def run_http(replay_server: ReplayServer, job_roles: list, locations: list, settings: argparse.Namespace, wait_profile: WaitProfile) -> int:
+    async def scrape():
+        async with TimedHttpClient(max_connections = settings.max_connections,wait_profile = wait_profile,\
+                                   request_budget = request_budget(settings)) as http_client:
+            return await asyncio.gather(*[http_client.scrape_search(replay_server.search_url(job_role,location)) for \
+                                          job_role in job_roles for location in locations],return_exceptions = True)
+    results = asyncio.run(scrape())
+    for result in results:
+        if isinstance(result,Exception): print(f"http: a search failed ({result!r})")
+    return sum(len(rows) for rows in results if not isinstance(rows,Exception))
+
+def run_selenium(replay_server: ReplayServer, job_roles: list, locations: list, settings: argparse.Namespace, wait_profile: WaitProfile) -> int:
+    start = time.perf_counter()
+    glassdoor_driver = start_glassdoor_driver(wait_profile)
+    wait_profile.record("startup-and-login",time.perf_counter() - start,False)
+    glassdoor_driver.request_budget = request_budget(settings)
+    number_of_postings = 0
+    try:
+        for job_role in job_roles:
+            for location in locations:
+                for _,rows in glassdoor_driver.iter_pages(job_role,location):
+                    number_of_postings += len(rows)
+    finally:
+        glassdoor_driver.quit()
+    return number_of_postings
+
+def run_pool(replay_server: ReplayServer, job_roles: list, locations: list, settings: argparse.Namespace, wait_profile: WaitProfile) -> int:
+    from WS_multiprocessing_jobs_locations import iter_scrape_pool
+    return sum(len(rows) for (_,_,_,rows) in iter_scrape_pool(job_roles,locations,settings.workers,request_budget = request_budget(settings),\
+                                                              wait_profile = wait_profile))
+
+ENGINES = {"http": run_http, "selenium": run_selenium, "pool": run_pool}
+
+def request_budget(settings: argparse.Namespace):
+    return RequestBudget(rate = settings.rate,max_rate = settings.rate*4) if settings.rate else None
+
+def stage_percentiles(wait_profile: WaitProfile) -> pd.DataFrame:
+    df = pd.DataFrame(wait_profile.records,columns = ["site","seconds","timed_out"])
+    return df.groupby("site").agg(count = ("seconds","size"), failed = ("timed_out","sum"),\
+                                  p50_ms = ("seconds",lambda x: np.percentile(x,50)*1000),\
+                                  p95_ms = ("seconds",lambda x: np.percentile(x,95)*1000),\
+                                  p99_ms = ("seconds",lambda x: np.percentile(x,99)*1000),\
+                                  total_seconds = ("seconds","sum")).sort_values("total_seconds",ascending = False)
+
+def parse_settings(arguments: list) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description = "Throughput benchmark of the scrapers against a local replay of glassdoor")
+    parser.add_argument("--engines",nargs = "+",choices = list(ENGINES),default = ["http"])
+    parser.add_argument("--job-roles",nargs = "+",default = ["Data Analyst","Data Engineer","Data Scientist"])
+    parser.add_argument("--locations",nargs = "+",default = ["Singapore"])
+    parser.add_argument("--postings-per-search",type = int,default = None,help = "Cut or repeat the recorded postings of every search")
+    parser.add_argument("--postings-per-page",type = int,default = 30)
+    parser.add_argument("--latency",type = float,default = 0,help = "Seconds added to every listing page and job posting")
+    parser.add_argument("--jitter",type = float,default = 0,help = "Up to this many seconds are added on top of the latency")
+    parser.add_argument("--failure-rate",type = float,default = 0,help = "Proportion of listing pages and job postings answered with a 503")
+    parser.add_argument("--workers",type = int,default = 4)
+    parser.add_argument("--max-connections",type = int,default = 64)
+    parser.add_argument("--rate",type = float,default = 0,help = "Starting requests/sec of a shared RequestBudget (0 to not rate limit)")
+    parser.add_argument("--results",default = "benchmark_results.csv")
+    return parser.parse_args(arguments)
+
+if __name__ == '__main__':
+    settings = parse_settings(sys.argv[1:])
+    results = []
+    with ReplayServer(postings_per_search = settings.postings_per_search,postings_per_page = settings.postings_per_page,\
+                      latency_seconds = settings.latency,jitter_seconds = settings.jitter,failure_rate = settings.failure_rate) as replay_server:
+        #The drivers (and worker processes) go to the replay server instead of glassdoor, and log in with any details
+        os.environ["GLASSDOOR_URL"] = WS_Glassdoor_Driver.GLASSDOOR_URL = replay_server.url
+        os.environ.setdefault("USERNAME_EMAIL","benchmark@example.com")
+        os.environ.setdefault("PASSWORD","benchmark")
+        WS_Glassdoor_Driver.username_email = WS_Glassdoor_Driver.username_email or os.environ["USERNAME_EMAIL"]
+        WS_Glassdoor_Driver.password = WS_Glassdoor_Driver.password or os.environ["PASSWORD"]
+
+        for engine in settings.engines:
+            wait_profile = WaitProfile()
+            replay_server.counts = {name:0 for name in replay_server.counts}
+            with PeakRssSampler() as rss_sampler:
+                start = time.perf_counter()
+                number_of_postings = ENGINES[engine](replay_server,settings.job_roles,settings.locations,settings,wait_profile)
+                seconds = time.perf_counter() - start
+            results.append({"date": datetime.datetime.now().isoformat(timespec = "seconds"), "engine": engine,\
+                            "workers": settings.workers if engine == "pool" else (settings.max_connections if engine == "http" else 1),\
+                            "latency": settings.latency, "jitter": settings.jitter, "failure_rate": settings.failure_rate,\
+                            "rate": settings.rate, "postings": number_of_postings, "seconds": round(seconds,3),\
+                            "postings_per_second": round(number_of_postings/seconds,2),\
+                            "peak_rss_mb": round(rss_sampler.peak_bytes/2**20,1),\
+                            "requests": replay_server.counts["listing"] + replay_server.counts["job_posting"],\
+                            "failed_requests": replay_server.counts["failed"]})
+            print(f"\n{engine}: {number_of_postings} postings in {seconds:.1f}s ({number_of_postings/seconds:.1f} postings/sec), "\
+                  f"peak RSS {rss_sampler.peak_bytes/2**20:.0f} MB, {results[-1]['requests']} requests "\
+                  f"({results[-1]['failed_requests']} failed on purpose)")
+            if wait_profile.records:
+                print(stage_percentiles(wait_profile).round(1).to_string())
+
+    df = pd.DataFrame(results)
+    print("\n" + df.drop(columns = ["date"]).to_string(index = False))
+    df.to_csv(settings.results,mode = "a",header = not os.path.exists(settings.results),index = False)
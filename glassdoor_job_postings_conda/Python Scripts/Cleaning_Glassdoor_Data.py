@@ -0,0 +1,165 @@
+"""
+This script contains the data cleaning steps of Cleaning_Glassdoor_Data.ipynb as an importable module, so that the cleaning can be run
+without jupyter (E.g. right after the scraper) and on much more data. Every function takes a whole pandas Series and uses vectorized
+string and regex operations (str.extract and friends) instead of running a python function on every row with .apply.
+Most columns only have a few distinct values (E.g. job_age, salary ranges, ratings of the same company), so the string operations
+are only run on the distinct values, and the results are spread back to every row with numpy indexing.
+
+The outputs are the same as the functions in the notebook, except for 2 cases where the notebook did not do what its docstring says:
+
+# 1. simplify_salary("SGD 7K (Employer est.)") gives 7000 (the notebook gave 7)
+# 2. clean_company of a company without a rating keeps the name (the notebook gave None)
+
+Running this script cleans every *_extracted_data.csv in the folder given (by default, the current working directory)
+and saves the result into cleaned_glassdoor_data.csv. Benchmark_Cleaning.py compares the speed of both versions.
+"""
+
+import os
+import re
+import sys
+import glob
+import functools
+import numpy as np
+import pandas as pd
+
+INDIVIDUAL_RATING_CATEGORIES = ['Career Opportunities','Comp & Benefits','Culture & Values','Senior Management', 'Work/Life Balance']
+
+def on_distinct_values(function):
+    #Runs function on the distinct values of the Series only, and spreads the result back to every row
+    @functools.wraps(function)
+    def wrapper(series: pd.Series) -> pd.Series:
+        codes,distinct_values = pd.factorize(series,use_na_sentinel = False)
+        result = function(pd.Series(distinct_values,dtype = series.dtype))
+        return pd.Series(result.to_numpy()[codes],index = series.index,name = series.name)
+    return wrapper
+
+@on_distinct_values
+def simplify_location(location: pd.Series) -> pd.Series:
+    """
+    Converts every location into "Remote" or "Singapore" accordingly
+    """
+    return pd.Series(np.where(location.astype(str).str.strip() == "Remote","Remote","Singapore"),index = location.index)
+
+@on_distinct_values
+def clean_age(length_of_time: pd.Series) -> pd.Series:
+    """
+    Converts into number of days. If length_of_time > 30d+, we will leave it as is.
+
+    Example:
+    "30d+" -> "30 days +"
+    "5d" -> "5 days"
+    "12h" -> "0.5 days"
+    """
+    #The unit starts at the last letter. Everything before it is the number.
+    parts = length_of_time.str.extract(r"^(?P<number>.*?)(?P<unit>[A-Za-z][^A-Za-z]*)$")
+    #A missing age (E.g. a posting tab without .listing-age) stays missing. Only ages that are there have to have a known unit.
+    unknown_units = length_of_time.notna() & ~parts["unit"].isin(["d","d+","h"])
+    if unknown_units.any():
+        raise ValueError(f"new data that does not have d,d+,h as units. Need edit code: {length_of_time[unknown_units].unique()}")
+
+    result = parts["number"] + " days"
+    result = result.mask(parts["unit"] == "d+",parts["number"] + " days +")
+    hours = parts["unit"] == "h"
+    days_from_hours = (pd.to_numeric(parts["number"][hours])/24).round(1).astype(str) + " days"
+    result[hours] = days_from_hours
+    return result
+
+@on_distinct_values
+def simplify_salary(salary_range: pd.Series) -> pd.Series:
+    """
+    Converts every salary range to an estimate of the salary by taking an average, in SGD.
+
+    E.g.
+    "SGD 50K - SGD 55K (Employer est.)" -> 52500
+    Nan -> Nan
+    "SGD 7K (Employer est.)" -> 7000
+    """
+    #Lower bound is the first number, upper bound is the last number (if there is more than one)
+    bounds = salary_range.str.extract(r"(?<!\S)(\d+)[A-Za-z]\S*(?:.*(?<!\S)(\d+)[A-Za-z])?").astype(float)
+    lower_bound = bounds[0]
+    upper_bound = bounds[1].fillna(lower_bound)
+    return (lower_bound + upper_bound)*1000/2
+
+@on_distinct_values
+def clean_company(name: pd.Series) -> pd.Series:
+    """
+    Removes the rating, and keeps the name of the company.
+    Code assumes that there is no number in the name of the company.
+
+    E.g.
+    "	Telstra3.9 ★" -> "Telstra"
+    """
+    return name.str.strip().str.replace(r"\d.*$","",regex = True)
+
+@on_distinct_values
+def clean_proportion(proportion: pd.Series) -> pd.Series:
+    """
+    E.g. "57 %" -> 57, Nan -> Nan
+    """
+    return pd.to_numeric(proportion.str.strip().str.extract(r"^(\S+)")[0])
+
+def separate_individual_ratings(individual_ratings: pd.Series) -> dict:
+    """
+    Takes the company_individual_ratings variable (Panda Series object, of list reprs or lists) and separates the individual ratings.
+    It outputs a dictionary of category -> Series of ratings. Ratings that are not given are Nan.
+
+    E.g.
+    individual_ratings = [ "['Career Opportunities', '1.0', 'Comp & Benefits', '1.0', 'Culture & Values', '1.0', 'Senior Management', '1.0', 'Work/Life Balance', '3.0']",
+                           "['Career Opportunities', '3.0', '', '', 'Culture & Values', '3.1', 'Senior Management', '3.0', 'Work/Life Balance', '3.5']"
+                         ]
+
+    separate_individual_ratings(individual_ratings) -> {"Career Opportunities" : [1.0, 3.0],
+                                                        "Comp & Benefits" : [1.0, Nan],
+                                                        "Culture & Values" : [1.0, 3.1],
+                                                        "Senior Management" : [1.0, 3.0],
+                                                        "Work/Life Balance" : [3.0, 3.5]
+                                                       }
+    """
+    #Lists (E.g. rows straight from the scraper) have the same repr as the strings saved in the csvs
+    codes,distinct_ratings = pd.factorize(individual_ratings.astype(str),use_na_sentinel = False)
+    distinct_ratings = pd.Series(distinct_ratings)
+    result = {}
+    for category in INDIVIDUAL_RATING_CATEGORIES:
+        ratings = pd.to_numeric(distinct_ratings.str.extract(f"'{re.escape(category)}', '([0-9.]+)'")[0])
+        result[category] = pd.Series(ratings.to_numpy()[codes],index = individual_ratings.index)
+    return result
+
+def clean_dataframe(df: pd.DataFrame) -> pd.DataFrame:
+    #Runs all the cleaning steps of the notebook, in the same order
+    df = df.drop(columns = ["Unnamed: 0"],errors = "ignore") #Remove the unnamed column
+    df = df.drop_duplicates(subset = "job_id") #Remove duplicates (base on job id)
+    df["job_location"] = simplify_location(df["job_location"])
+    df["job_age"] = clean_age(df["job_age"])
+    df["job_salary_range"] = simplify_salary(df["job_salary_range"]) #to rename column later as it is not a range
+    df = df.dropna(subset = ["company"])
+    df["company"] = clean_company(df["company"])
+    df["proportion_reviewers_recommend_company"] = clean_proportion(df["proportion_reviewers_recommend_company"])
+
+    for category,values in separate_individual_ratings(df["company_individual_ratings"]).items():
+        df.insert(9,category,values)
+    df.pop("company_individual_ratings")
+
+    df = df.rename({"job_location": "location",
+                    "job_age": "age",
+                    "job_salary_range": "salary_estimate",
+                    "job_salary_estimate_type": "salary_estimate_type"}, axis = 1)
+    return df
+
+def load_extracted_data(directory: str) -> pd.DataFrame:
+    #Concatenates every *_extracted_data.csv in the directory. If the job postings were saved without their company columns
+    #(see WS_Company_Cache.py), they are joined back from companies_extracted_data.csv.
+    csv_filenames = sorted(f for f in glob.glob(f"{directory}/*_extracted_data.csv") if not f.endswith("companies_extracted_data.csv"))
+    df = pd.concat([pd.read_csv(f) for f in csv_filenames])
+    companies_filename = f"{directory}/companies_extracted_data.csv"
+    if "company_individual_ratings" not in df.columns and os.path.exists(companies_filename):
+        from WS_Company_Cache import employer_key
+        companies = pd.read_csv(companies_filename).drop(columns = ["scraped_at"],errors = "ignore")
+        df["employer"] = df["company"].map(employer_key,na_action = "ignore")
+        df = df.merge(companies.rename(columns = {"company": "employer"}),on = "employer",how = "left").drop(columns = ["employer"])
+    return df
+
+if __name__ == '__main__':
+    directory = sys.argv[1] if len(sys.argv) > 1 else os.getcwd()
+    df = clean_dataframe(load_extracted_data(directory))
+    df.to_csv(f"{os.getcwd()}/cleaned_glassdoor_data.csv",index = False)
+    print(f"Cleaned {len(df)} job postings")
@@ -0,0 +1,104 @@
+"""
+This script contains the CheckpointStore class, which lets a scrape that dies halfway be restarted without starting the job role again.
+
+For every (job_role, location) search, the store keeps 2 files in the checkpoint directory:
+
+# 1. {job_role}_{location}_rows.jsonl: Every row scraped, appended one line at a time as soon as the job posting is extracted.
+#    The job_ids already extracted are read back from this file, so even a hard kill only loses the posting being extracted.
+# 2. {job_role}_{location}.json: The pages that have been fully scraped and the total number of pages of the search.
+
+A restarted run skips the pages that are finished and the job postings that are already in the rows file.
+The checkpoints of each scrape date are kept in their own directory (checkpoints/{scrape_date}), so a scrape on the next day starts
+from page 1 again instead of finding every search already finished.
+"""
+
+import os
+import json
+import datetime
+from typing import Optional
+
+class CheckpointStore:
+    def __init__(self,directory: Optional[str] = None, scrape_date: Optional[str] = None):
+        #scrape_date is today by default. To continue a run that was stopped on an earlier day, pass the date it started on.
+        self.directory = directory or f"{os.getcwd()}/checkpoints/{scrape_date or datetime.date.today().isoformat()}"
+        os.makedirs(self.directory,exist_ok = True)
+
+    def file_path(self,job_role: str, location: str, suffix: str) -> str:
+        return f"{self.directory}/{job_role.replace(' ','_')}_{location.replace(' ','_')}{suffix}"
+
+    def load(self,job_role: str, location: str) -> dict:
+        #Returns {"finished_pages": [...], "last_page_number": int or None} of the search
+        try:
+            with open(self.file_path(job_role,location,".json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"finished_pages": [], "last_page_number": None}
+
+    def finished_pages(self,job_role: str, location: str) -> set:
+        return set(self.load(job_role,location)["finished_pages"])
+
+    def next_page(self,job_role: str, location: str) -> int:
+        #Smallest page of the search that has not been finished yet
+        finished_pages = self.finished_pages(job_role,location)
+        page_number = 1
+        while page_number in finished_pages: page_number += 1
+        return page_number
+
+    def is_finished(self,job_role: str, location: str) -> bool:
+        checkpoint = self.load(job_role,location)
+        if checkpoint["last_page_number"] is None: return False
+        return set(range(1,checkpoint["last_page_number"] + 1)) <= set(checkpoint["finished_pages"])
+
+    def finish_page(self,job_role: str, location: str, page_number: int, last_page_number: int):
+        #Records that every job posting of the page has been extracted. The file is replaced in one step,
+        #so it is never left half written.
+        checkpoint = self.load(job_role,location)
+        checkpoint["finished_pages"] = sorted(set(checkpoint["finished_pages"]) | {page_number})
+        checkpoint["last_page_number"] = last_page_number
+        file_path = self.file_path(job_role,location,".json")
+        with open(f"{file_path}.tmp","w") as f:
+            json.dump(checkpoint,f)
+        os.replace(f"{file_path}.tmp",file_path)
+
+    def append_row(self,job_role: str, location: str, page_number: int, row: list):
+        #Appends a single row with one write call, so rows appended by different processes do not get mixed up
+        line = json.dumps({"page": page_number, "row": row}) + "\n"
+        fd = os.open(self.file_path(job_role,location,"_rows.jsonl"),os.O_WRONLY | os.O_APPEND | os.O_CREAT)
+        try:
+            os.write(fd,line.encode())
+        finally:
+            os.close(fd)
+
+    def load_records(self,job_role: str, location: str) -> list:
+        records = []
+        try:
+            with open(self.file_path(job_role,location,"_rows.jsonl")) as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError: #Last line can be cut short if the process was killed while writing it
+                        continue
+        except FileNotFoundError:
+            pass
+        return records
+
+    def job_ids(self,job_role: str, location: str) -> set:
+        return {record["row"][0] for record in self.load_records(job_role,location)}
+
+    def load_rows(self,job_role: str, location: str) -> list:
+        #All rows of the search in page order, without repeated job_ids
+        rows, seen_job_ids = [], set()
+        for record in sorted(self.load_records(job_role,location),key = lambda record: record["page"]):
+            if record["row"][0] in seen_job_ids: continue
+            seen_job_ids.add(record["row"][0])
+            rows.append(record["row"])
+        return rows
+
+    def page_rows(self,job_role: str, location: str, page_number: int) -> list:
+        #Rows of a single page, without repeated job_ids. Includes the rows saved by attempts of the page that failed halfway.
+        rows, seen_job_ids = [], set()
+        for record in self.load_records(job_role,location):
+            if record["page"] != page_number or record["row"][0] in seen_job_ids: continue
+            seen_job_ids.add(record["row"][0])
+            rows.append(record["row"])
+        return rows
@@ -0,0 +1,89 @@
+"""
+This script contains the CompanyCache class, which stores the profile of every company (employer) on disk, so that it only has to be
+scraped once instead of once per job posting. Hundreds of postings can share the same employer.
+
+The profile of a company is made of these columns of GlassdoorDriver.data:
+
+# 1. company_total_rating
+# 2. proportion_reviewers_recommend_company
+# 3. company_individual_ratings
+# 4. company_type_size_sector_industry_yearFounded
+
+Companies are keyed by the employer name shown in job-employer-{id}, without the rating that glassdoor puts after it
+(E.g. "VORO MOTORS3.8 ★" -> "VORO MOTORS"). A profile older than ttl_days is treated as missing, so it gets scraped again.
+A profile without any of the columns (E.g. the company section had not loaded yet) is not cached, so the next posting of the company
+scrapes it again.
+The cache is a sqlite file, so it can be shared by many processes and kept from one run to the next.
+"""
+
+import os
+import re
+import json
+import time
+import sqlite3
+from typing import Optional
+import pandas as pd
+
+COMPANY_COLUMN_NAMES = ["company_total_rating", "proportion_reviewers_recommend_company", \
+                        "company_individual_ratings", "company_type_size_sector_industry_yearFounded"]
+
+def employer_key(company: Optional[str]) -> Optional[str]:
+    #Removes the rating after the name of the company. E.g. "	Telstra3.9 ★" -> "Telstra"
+    if company is None: return None
+    return re.sub(r"\s*\d+\.\d+\s*★?\s*$","",company.strip())
+
+def is_empty_profile(profile: dict) -> bool:
+    #True if every column of the profile is None, or a list of only Nones. E.g. company_type_size_sector_industry_yearFounded = [None]*5
+    return all(value is None or (isinstance(value,list) and all(item is None for item in value)) for value in \
+               [profile[column_name] for column_name in COMPANY_COLUMN_NAMES])
+
+class CompanyCache:
+    def __init__(self,path: Optional[str] = None, ttl_days: float = 30):
+        self.path = path or f"{os.getcwd()}/company_cache.db"
+        self.ttl_seconds = ttl_days*24*60*60
+        self._connection = None
+        with self.connection() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS companies (company TEXT PRIMARY KEY, company_total_rating TEXT, "\
+                               "proportion_reviewers_recommend_company TEXT, company_individual_ratings TEXT, "\
+                               "company_type_size_sector_industry_yearFounded TEXT, scraped_at REAL)")
+
+    def __getstate__(self):
+        #sqlite connections cannot be sent to another process. Each process opens its own connection to the same file.
+        return {"path": self.path, "ttl_seconds": self.ttl_seconds, "_connection": None}
+
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path,timeout = 60)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+        return self._connection
+
+    def get(self,company: str) -> Optional[dict]:
+        #Returns the profile of the company as a dictionary of COMPANY_COLUMN_NAMES, or None if it is missing, expired or empty
+        row = self.connection().execute("SELECT company_total_rating, proportion_reviewers_recommend_company, "\
+                                        "company_individual_ratings, company_type_size_sector_industry_yearFounded "\
+                                        "FROM companies WHERE company = ? AND scraped_at >= ?",\
+                                        (employer_key(company),time.time() - self.ttl_seconds)).fetchone()
+        if row is None: return None
+        total_rating, proportion, individual_ratings, type_size_sector_industry_yearFounded = row
+        profile = {"company_total_rating": total_rating,
+                   "proportion_reviewers_recommend_company": proportion,
+                   "company_individual_ratings": json.loads(individual_ratings),
+                   "company_type_size_sector_industry_yearFounded": json.loads(type_size_sector_industry_yearFounded)}
+        #Empty profiles saved by an earlier version are scraped again, and replaced by the next profile that is not empty
+        return None if is_empty_profile(profile) else profile
+
+    def put(self,company: str, profile: dict):
+        if is_empty_profile(profile): return
+        with self.connection() as connection:
+            connection.execute("INSERT OR REPLACE INTO companies VALUES (?,?,?,?,?,?)",\
+                               (employer_key(company),profile["company_total_rating"],\
+                                profile["proportion_reviewers_recommend_company"],\
+                                json.dumps(profile["company_individual_ratings"]),\
+                                json.dumps(profile["company_type_size_sector_industry_yearFounded"]),time.time()))
+
+    def companies(self) -> pd.DataFrame:
+        #The companies table, with the lists decoded back into python lists
+        df = pd.read_sql_query("SELECT * FROM companies ORDER BY company",self.connection())
+        for column_name in ["company_individual_ratings","company_type_size_sector_industry_yearFounded"]:
+            df[column_name] = df[column_name].apply(json.loads)
+        return df
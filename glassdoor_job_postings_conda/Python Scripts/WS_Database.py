@@ -0,0 +1,165 @@
+"""
+This script contains the GlassdoorDatabase class, which stores the scraped data into a single sqlite file instead of one csv per job role.
+
+The database has 3 tables:
+
+# 1. job_postings: One row per job_id, with the job posting columns of GlassdoorDriver.data (see POSTING_COLUMN_NAMES), the date the
+#    posting was first scraped, the date it was last seen (scrape_date), and the date it was found to be gone (closed_date).
+# 2. companies: One row per company (the employer name without its rating, see WS_Company_Cache.employer_key), with the company columns.
+# 3. job_search_roles: Every (job_id, job_role, location) a posting showed up under, with the date it was last seen there.
+
+Rows are upserted in batches (executemany with INSERT ... ON CONFLICT DO UPDATE), so scraping the same job roles again the next day
+updates the rows in place instead of adding copies that have to be deduplicated. job_role, location, company and scrape_date are
+indexed, so the dashboard can query the database directly (E.g. with postings(job_role = "Data Analyst")).
+
+The database also allows incremental scrapes (see scrape_job_role). The job_id and age of every posting tab are read from the
+listing page and compared with the database with update_from_listing. Only new postings and reposted postings (whose age went down)
+are opened. The others only get their age and scrape_date updated. Once every page of a search is done, close_missing_postings marks
+the postings of the search that were not seen as closed, so lifetimes() gives how long each posting stayed up.
+"""
+
+import os
+import re
+import json
+import sqlite3
+import datetime
+from typing import Optional
+import pandas as pd
+from WS_Glassdoor_Driver import DATA_COLUMN_NAMES, POSTING_COLUMN_NAMES
+from WS_Company_Cache import COMPANY_COLUMN_NAMES, employer_key
+
+LIST_COLUMN_NAMES = ["company_individual_ratings","company_type_size_sector_industry_yearFounded"] #Saved as json text
+
+def age_in_days(job_age: Optional[str]) -> Optional[float]:
+    #E.g. "12h" -> 0.5, "5d" -> 5, "30d+" -> 30, None -> None
+    match = re.match(r"^\s*(\d+)\s*([dh])",job_age or "")
+    if match is None: return None
+    return int(match.group(1))/(24 if match.group(2) == "h" else 1)
+
+class GlassdoorDatabase:
+    def __init__(self,path: Optional[str] = None):
+        self.path = path or f"{os.getcwd()}/glassdoor.db"
+        self._connection = None
+        with self.connection() as connection:
+            connection.execute(f"CREATE TABLE IF NOT EXISTS job_postings (job_id TEXT PRIMARY KEY, "\
+                               f"{', '.join(f'{column_name} TEXT' for column_name in POSTING_COLUMN_NAMES[1:])}, "\
+                               f"first_scrape_date TEXT, scrape_date TEXT, closed_date TEXT)")
+            if "closed_date" not in [column[1] for column in connection.execute("PRAGMA table_info(job_postings)")]:
+                connection.execute("ALTER TABLE job_postings ADD COLUMN closed_date TEXT") #Databases made before incremental scrapes
+            connection.execute(f"CREATE TABLE IF NOT EXISTS companies (company TEXT PRIMARY KEY, "\
+                               f"{', '.join(f'{column_name} TEXT' for column_name in COMPANY_COLUMN_NAMES)}, scrape_date TEXT)")
+            connection.execute("CREATE TABLE IF NOT EXISTS job_search_roles (job_id TEXT, job_role TEXT, location TEXT, scrape_date TEXT, "\
+                               "PRIMARY KEY (job_id, job_role, location))")
+            connection.execute("CREATE INDEX IF NOT EXISTS job_postings_company ON job_postings (company)")
+            connection.execute("CREATE INDEX IF NOT EXISTS job_postings_scrape_date ON job_postings (scrape_date)")
+            connection.execute("CREATE INDEX IF NOT EXISTS job_search_roles_job_role ON job_search_roles (job_role, location)")
+            connection.execute("CREATE INDEX IF NOT EXISTS job_search_roles_location ON job_search_roles (location)")
+            connection.execute("CREATE INDEX IF NOT EXISTS companies_scrape_date ON companies (scrape_date)")
+
+    def __getstate__(self):
+        #sqlite connections cannot be sent to another process. Each process opens its own connection to the same file.
+        return {"path": self.path, "_connection": None}
+
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path,timeout = 60)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL") #Safe with WAL, and much faster for bulk upserts
+        return self._connection
+
+    def upsert_rows(self,rows: list, job_role: str, location: str, scrape_date: Optional[str] = None):
+        #Saves rows of GlassdoorDriver.data scraped under the search, in one transaction.
+        #A job posting or company that is already in the database is updated, keeping the date it was first scraped.
+        scrape_date = scrape_date or datetime.date.today().isoformat()
+        job_postings, companies, job_search_roles = [], {}, []
+        for row in rows:
+            job_posting = dict(zip(DATA_COLUMN_NAMES,row))
+            company = employer_key(job_posting["company"])
+            job_postings.append([job_posting[column_name] for column_name in POSTING_COLUMN_NAMES[:-1]] + [company,scrape_date,scrape_date,None])
+            if company is not None and any(job_posting[column_name] is not None for column_name in COMPANY_COLUMN_NAMES):
+                companies[company] = [company] + [json.dumps(job_posting[column_name]) if column_name in LIST_COLUMN_NAMES else \
+                                                  job_posting[column_name] for column_name in COMPANY_COLUMN_NAMES] + [scrape_date]
+            job_search_roles.append((job_posting["job_id"],job_role,location,scrape_date))
+
+        posting_updates = ", ".join(f"{column_name} = excluded.{column_name}" for column_name in \
+                                    POSTING_COLUMN_NAMES[1:] + ["scrape_date","closed_date"])
+        company_updates = ", ".join(f"{column_name} = excluded.{column_name}" for column_name in COMPANY_COLUMN_NAMES + ["scrape_date"])
+        with self.connection() as connection:
+            connection.executemany(f"INSERT INTO job_postings ({', '.join(POSTING_COLUMN_NAMES)}, first_scrape_date, scrape_date, closed_date) "\
+                                   f"VALUES ({','.join('?'*(len(POSTING_COLUMN_NAMES) + 3))}) "\
+                                   f"ON CONFLICT (job_id) DO UPDATE SET {posting_updates}",job_postings)
+            connection.executemany(f"INSERT INTO companies VALUES ({','.join('?'*(len(COMPANY_COLUMN_NAMES) + 2))}) "\
+                                   f"ON CONFLICT (company) DO UPDATE SET {company_updates}",companies.values())
+            connection.executemany("INSERT INTO job_search_roles VALUES (?,?,?,?) "\
+                                   "ON CONFLICT (job_id, job_role, location) DO UPDATE SET scrape_date = excluded.scrape_date",\
+                                   job_search_roles)
+
+    def upsert_search_roles(self,search_roles: pd.DataFrame, scrape_date: Optional[str] = None):
+        #Adds the searches a posting showed up under without being extracted there (E.g. JobIndex.search_roles())
+        scrape_date = scrape_date or datetime.date.today().isoformat()
+        with self.connection() as connection:
+            connection.executemany("INSERT INTO job_search_roles VALUES (?,?,?,?) "\
+                                   "ON CONFLICT (job_id, job_role, location) DO UPDATE SET scrape_date = excluded.scrape_date",\
+                                   [(job_id,job_role,location,scrape_date) for (job_id,job_role,location) in \
+                                    search_roles[["job_id","job_role","location"]].itertuples(index = False)])
+
+    def update_from_listing(self,listings: list, job_role: str, location: str, scrape_date: Optional[str] = None) -> set:
+        #listings is a list of (job_id, job_age) read from the posting tabs of a listing page.
+        #Returns the job_ids that have to be extracted: postings that are not in the database yet, and postings that were reposted
+        #(their age is lower than the age saved). Every other posting is not opened again. For every posting already in the
+        #database, the age and scrape_date are updated, it is reopened if it had been closed, and the search is added to its search roles.
+        scrape_date = scrape_date or datetime.date.today().isoformat()
+        job_ids = [job_id for (job_id,_) in listings]
+        saved_ages = dict(self.connection().execute(f"SELECT job_id, job_age FROM job_postings WHERE job_id IN ({','.join('?'*len(job_ids))})",\
+                                                    job_ids).fetchall())
+        to_extract, seen = set(), []
+        for job_id,job_age in listings:
+            if job_id not in saved_ages:
+                to_extract.add(job_id)
+                continue
+            saved_age, age = age_in_days(saved_ages[job_id]), age_in_days(job_age)
+            if saved_age is not None and age is not None and age < saved_age - 1:
+                to_extract.add(job_id)
+            seen.append((job_age or saved_ages[job_id],scrape_date,job_id))
+        with self.connection() as connection:
+            connection.executemany("UPDATE job_postings SET job_age = ?, scrape_date = ?, closed_date = NULL WHERE job_id = ?",seen)
+            connection.executemany("INSERT INTO job_search_roles VALUES (?,?,?,?) "\
+                                   "ON CONFLICT (job_id, job_role, location) DO UPDATE SET scrape_date = excluded.scrape_date",\
+                                   [(job_id,job_role,location,scrape_date) for (_,_,job_id) in seen])
+        return to_extract
+
+    def close_missing_postings(self,job_role: str, location: str, scrape_date: Optional[str] = None) -> int:
+        #Call once every page of the search has been scraped on scrape_date. Postings of the search that were not seen on that day
+        #(under any search) are marked closed on that day. Returns the number of postings closed.
+        scrape_date = scrape_date or datetime.date.today().isoformat()
+        with self.connection() as connection:
+            cursor = connection.execute("UPDATE job_postings SET closed_date = ? WHERE closed_date IS NULL AND scrape_date < ? AND job_id IN "\
+                                        "(SELECT job_id FROM job_search_roles WHERE job_role = ? AND location = ?)",\
+                                        (scrape_date,scrape_date,job_role,location))
+            return cursor.rowcount
+
+    def lifetimes(self) -> pd.DataFrame:
+        #How many days every posting has been up, from the day it was first scraped to the day it closed (or was last seen, if it is still open)
+        return pd.read_sql_query("SELECT job_id, job_name, company, first_scrape_date, scrape_date, closed_date, "\
+                                 "julianday(COALESCE(closed_date, scrape_date)) - julianday(first_scrape_date) AS lifetime_days "\
+                                 "FROM job_postings ORDER BY first_scrape_date, job_id",self.connection())
+
+    def postings(self,job_role: Optional[str] = None, location: Optional[str] = None, company: Optional[str] = None,\
+                 since: Optional[str] = None) -> pd.DataFrame:
+        #Job postings with the columns of GlassdoorDriver.data (the company columns joined from the companies table), plus
+        #job_role, location, first_scrape_date, scrape_date and closed_date. A posting under several searches has one row per search.
+        #Every filter is optional. since is a date (E.g. "2023-08-01"), to only keep postings scraped on or after it.
+        filters, parameters = [], []
+        for (condition,value) in [("r.job_role = ?",job_role),("r.location = ?",location),\
+                                  ("p.company = ?",employer_key(company)),("p.scrape_date >= ?",since)]:
+            if value is not None:
+                filters.append(condition)
+                parameters.append(value)
+        query = f"SELECT p.{', p.'.join(POSTING_COLUMN_NAMES)}, c.{', c.'.join(COMPANY_COLUMN_NAMES)}, "\
+                f"r.job_role, r.location, p.first_scrape_date, p.scrape_date, p.closed_date "\
+                f"FROM job_postings p JOIN job_search_roles r ON r.job_id = p.job_id LEFT JOIN companies c ON c.company = p.company"\
+                f"{' WHERE ' + ' AND '.join(filters) if filters else ''} ORDER BY r.job_role, r.location, p.job_id"
+        df = pd.read_sql_query(query,self.connection(),params = parameters)
+        for column_name in LIST_COLUMN_NAMES:
+            df[column_name] = df[column_name].map(json.loads,na_action = "ignore")
+        return df
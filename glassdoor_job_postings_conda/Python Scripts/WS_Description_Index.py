@@ -0,0 +1,224 @@
+"""
+This script contains the DescriptionIndex class, an index of the job posting descriptions, so that questions like "which skills do
+Data Engineer postings ask for" or "what is asked for together with Spark" do not need a str.contains pass over every description.
+
+Every description is tokenized once, when its rows come back from the scraper (or again if the description changed), into:
+
+# 1. posting_skills: An inverted index of skill -> job_ids, for the skills in SKILLS (E.g. "python", "sql", "power bi")
+# 2. role_skill_counts / company_skill_counts / skill_counts: The number of postings asking for each skill per search
+#    (job_role, location), per company and overall. They are kept up to date as postings are added, so skill frequencies are lookups.
+# 3. description_text: A FTS5 full text table of the descriptions, for keywords that are not in SKILLS (E.g. search("visa sponsorship")).
+#    Only if the sqlite of the python install was built with FTS5.
+
+A posting extracted once but shown under several searches (see WS_Job_Index.py) is added to the other searches with add_search_roles,
+which only updates the counts, without tokenizing the description again.
+"""
+
+import os
+import re
+import sys
+import glob
+import hashlib
+import sqlite3
+from typing import Optional
+import pandas as pd
+from WS_Glassdoor_Driver import DATA_COLUMN_NAMES
+from WS_Company_Cache import employer_key
+
+#Skill -> the ways it is written in descriptions. Descriptions are split into words (see tokenize), so "node.js", "ci/cd" and "a/b testing"
+#are written with spaces. Aliases with capital letters (E.g. "R", "SAS") are case sensitive, every other alias is matched in lower case.
+SKILLS = {"python": ["python"], "r": ["R", "rstudio"], "sql": ["sql", "mysql", "nosql", "t sql", "tsql", "pl sql", "ms sql", "postgresql"],
+          "scala": ["scala"], "java": ["java"], "javascript": ["javascript", "typescript", "node js", "nodejs"], "c++": ["c++"],
+          "c#": ["c#"], "go": ["Golang", "golang"], "matlab": ["matlab"], "sas": ["SAS"], "spss": ["spss"], "stata": ["stata"],
+          "excel": ["excel"], "vba": ["vba"], "tableau": ["tableau"], "power bi": ["power bi", "powerbi"], "looker": ["looker"],
+          "qlik": ["qlik", "qlikview", "qliksense", "qlik sense"], "dax": ["DAX"], "spark": ["spark", "pyspark"], "hadoop": ["hadoop"],
+          "hive": ["hive"], "kafka": ["kafka"], "airflow": ["airflow"], "dbt": ["dbt"], "snowflake": ["snowflake"],
+          "databricks": ["databricks"], "bigquery": ["bigquery", "big query"], "redshift": ["redshift"], "etl": ["etl", "elt"],
+          "data warehouse": ["data warehouse", "data warehouses", "data warehousing", "data lake", "data lakes", "lakehouse"],
+          "oracle": ["oracle"], "sql server": ["sql server", "mssql"], "postgresql": ["postgres", "postgresql"],
+          "mongodb": ["mongodb", "mongo db"], "aws": ["aws", "amazon web services"], "azure": ["azure"], "gcp": ["gcp", "google cloud"],
+          "docker": ["docker"], "kubernetes": ["kubernetes", "k8s"], "linux": ["linux", "unix"], "git": ["git", "github", "gitlab"],
+          "ci/cd": ["ci cd", "cicd"], "rest api": ["rest api", "rest apis", "restful", "restful api", "restful apis"],
+          "pandas": ["pandas"], "numpy": ["numpy"], "scikit-learn": ["scikit learn", "sklearn"], "tensorflow": ["tensorflow"],
+          "pytorch": ["pytorch", "torch"], "keras": ["keras"], "mlops": ["mlops"], "machine learning": ["machine learning"],
+          "deep learning": ["deep learning"], "nlp": ["nlp", "natural language processing"], "computer vision": ["computer vision"],
+          "llm": ["llm", "llms", "large language model", "large language models", "generative ai", "genai", "gen ai"],
+          "statistics": ["statistics", "statistical"], "a/b testing": ["a b testing", "a b test", "a b tests", "ab testing"],
+          "data visualization": ["data visualization", "data visualisation", "visualization", "visualisation", "visualizations",
+                                 "visualisations"],
+          "data modelling": ["data modelling", "data modeling"], "data governance": ["data governance"], "agile": ["agile", "scrum"],
+          "jira": ["jira"], "sap": ["SAP"], "salesforce": ["salesforce"], "microservices": ["microservices", "micro services"]}
+SKILL_ALIASES = {alias:skill for (skill,aliases) in SKILLS.items() for alias in aliases}
+MAX_ALIAS_WORDS = max(len(alias.split()) for alias in SKILL_ALIASES)
+
+def tokenize(description: str) -> list:
+    #Splits a description into words, keeping "c++", "c#" and "R&D" (so that it is not read as R) in one piece
+    return re.findall(r"[\w+#&]+",description)
+
+def extract_skills(description: Optional[str]) -> set:
+    #E.g. "Experience with Python, SQL and Power BI" -> {"python", "sql", "power bi"}
+    if not description: return set()
+    words = tokenize(description)
+    lower_words = [word.lower() for word in words]
+    phrases = set(words) | {" ".join(lower_words[i:i + n]) for n in range(1,MAX_ALIAS_WORDS + 1) for i in range(len(words) - n + 1)}
+    return {SKILL_ALIASES[phrase] for phrase in phrases if phrase in SKILL_ALIASES}
+
+def description_hash(description: Optional[str]) -> str:
+    return hashlib.sha1((description or "").encode()).hexdigest()
+
+class DescriptionIndex:
+    def __init__(self,path: Optional[str] = None):
+        self.path = path or f"{os.getcwd()}/description_index.db"
+        self._connection = None
+        with self.connection() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS description_postings (job_id TEXT PRIMARY KEY, company TEXT, description_hash TEXT)")
+            connection.execute("CREATE TABLE IF NOT EXISTS posting_skills (skill TEXT, job_id TEXT, PRIMARY KEY (skill, job_id)) WITHOUT ROWID")
+            connection.execute("CREATE TABLE IF NOT EXISTS posting_roles (job_id TEXT, job_role TEXT, location TEXT, "\
+                               "PRIMARY KEY (job_id, job_role, location)) WITHOUT ROWID")
+            connection.execute("CREATE TABLE IF NOT EXISTS skill_counts (skill TEXT PRIMARY KEY, postings INTEGER) WITHOUT ROWID")
+            connection.execute("CREATE TABLE IF NOT EXISTS role_skill_counts (job_role TEXT, location TEXT, skill TEXT, postings INTEGER, "\
+                               "PRIMARY KEY (job_role, location, skill)) WITHOUT ROWID")
+            connection.execute("CREATE TABLE IF NOT EXISTS company_skill_counts (company TEXT, skill TEXT, postings INTEGER, "\
+                               "PRIMARY KEY (company, skill)) WITHOUT ROWID")
+            connection.execute("CREATE INDEX IF NOT EXISTS posting_skills_job_id ON posting_skills (job_id, skill)")
+            connection.execute("CREATE INDEX IF NOT EXISTS posting_roles_job_role ON posting_roles (job_role, location, job_id)")
+            connection.execute("CREATE INDEX IF NOT EXISTS description_postings_company ON description_postings (company)")
+            try:
+                connection.execute("CREATE VIRTUAL TABLE IF NOT EXISTS description_text USING fts5(job_id UNINDEXED, description)")
+                self.full_text = True
+            except sqlite3.OperationalError: #sqlite built without FTS5. Skill queries still work, search does not.
+                self.full_text = False
+
+    def __getstate__(self):
+        #sqlite connections cannot be sent to another process. Each process opens its own connection to the same file.
+        return {"path": self.path, "_connection": None, "full_text": self.full_text}
+
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path,timeout = 60)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+        return self._connection
+
+    def change_counts(self,connection: sqlite3.Connection, skills: set, change: int, company: Optional[str] = None,\
+                      roles: list = (), overall: bool = True):
+        #Adds change (1 or -1) to the counts of every skill, overall, for the company and for every (job_role, location) in roles
+        if overall:
+            connection.executemany("INSERT INTO skill_counts VALUES (?,?) ON CONFLICT (skill) DO UPDATE SET postings = postings + excluded.postings",\
+                                   [(skill,change) for skill in skills])
+        if company is not None:
+            connection.executemany("INSERT INTO company_skill_counts VALUES (?,?,?) "\
+                                   "ON CONFLICT (company, skill) DO UPDATE SET postings = postings + excluded.postings",\
+                                   [(company,skill,change) for skill in skills])
+        connection.executemany("INSERT INTO role_skill_counts VALUES (?,?,?,?) "\
+                               "ON CONFLICT (job_role, location, skill) DO UPDATE SET postings = postings + excluded.postings",\
+                               [(job_role,location,skill,change) for (job_role,location) in roles for skill in skills])
+
+    def add_rows(self,rows: list, job_role: str, location: str) -> int:
+        #Indexes rows of GlassdoorDriver.data scraped under the search, in one transaction. A description is only tokenized if the
+        #posting is new or its description changed. Returns the number of descriptions tokenized.
+        number_tokenized = 0
+        with self.connection() as connection:
+            for row in rows:
+                job_posting = dict(zip(DATA_COLUMN_NAMES,row))
+                job_id, description = str(job_posting["job_id"]), job_posting["job_posting_description"]
+                company = employer_key(job_posting["company"]) if isinstance(job_posting["company"],str) else None
+                description = description if isinstance(description,str) else None
+                saved = connection.execute("SELECT company, description_hash FROM description_postings WHERE job_id = ?",(job_id,)).fetchone()
+                if saved is None or saved[1] != description_hash(description):
+                    roles = connection.execute("SELECT job_role, location FROM posting_roles WHERE job_id = ?",(job_id,)).fetchall()
+                    if saved is not None: #The description changed (E.g. reposted), so the old skills are taken out of the counts first
+                        old_skills = {skill for (skill,) in connection.execute("SELECT skill FROM posting_skills WHERE job_id = ?",(job_id,))}
+                        self.change_counts(connection,old_skills,-1,saved[0],roles)
+                        connection.execute("DELETE FROM posting_skills WHERE job_id = ?",(job_id,))
+                        if self.full_text: connection.execute("DELETE FROM description_text WHERE job_id = ?",(job_id,))
+                    skills = extract_skills(description)
+                    connection.executemany("INSERT INTO posting_skills VALUES (?,?)",[(skill,job_id) for skill in skills])
+                    self.change_counts(connection,skills,1,company,roles)
+                    connection.execute("INSERT OR REPLACE INTO description_postings VALUES (?,?,?)",(job_id,company,description_hash(description)))
+                    if self.full_text and description:
+                        connection.execute("INSERT INTO description_text VALUES (?,?)",(job_id,description))
+                    number_tokenized += 1
+                self.add_role(connection,job_id,job_role,location)
+        return number_tokenized
+
+    def add_role(self,connection: sqlite3.Connection, job_id: str, job_role: str, location: str):
+        if connection.execute("INSERT OR IGNORE INTO posting_roles VALUES (?,?,?)",(job_id,job_role,location)).rowcount == 1:
+            skills = {skill for (skill,) in connection.execute("SELECT skill FROM posting_skills WHERE job_id = ?",(job_id,))}
+            self.change_counts(connection,skills,1,roles = [(job_role,location)],overall = False)
+
+    def add_search_roles(self,search_roles: pd.DataFrame):
+        #Adds the searches a posting showed up under without being extracted there (E.g. JobIndex.search_roles())
+        with self.connection() as connection:
+            for (job_id,job_role,location) in search_roles[["job_id","job_role","location"]].itertuples(index = False):
+                self.add_role(connection,str(job_id),job_role,location)
+
+    def skill_counts(self,job_role: Optional[str] = None, location: Optional[str] = None, company: Optional[str] = None) -> pd.DataFrame:
+        #Number and share of postings asking for each skill, most asked for first. Read from the counts kept by add_rows.
+        #With a job_role but no location, the counts of every location are added up.
+        if company is not None:
+            company = employer_key(company)
+            counts = pd.read_sql_query("SELECT skill, postings FROM company_skill_counts WHERE company = ? AND postings > 0",\
+                                       self.connection(),params = [company])
+            total = self.connection().execute("SELECT COUNT(*) FROM description_postings WHERE company = ?",(company,)).fetchone()[0]
+        elif job_role is not None or location is not None:
+            filters, parameters = self.role_filters(job_role,location)
+            counts = pd.read_sql_query(f"SELECT skill, SUM(postings) AS postings FROM role_skill_counts WHERE {filters} AND postings > 0 "\
+                                       f"GROUP BY skill",self.connection(),params = parameters)
+            total = self.connection().execute(f"SELECT COUNT(*) FROM posting_roles WHERE {filters}",parameters).fetchone()[0]
+        else:
+            counts = pd.read_sql_query("SELECT skill, postings FROM skill_counts WHERE postings > 0",self.connection())
+            total = self.connection().execute("SELECT COUNT(*) FROM description_postings").fetchone()[0]
+        counts["share"] = counts["postings"]/total if total else 0.0
+        return counts.sort_values(["postings","skill"],ascending = [False,True],ignore_index = True)
+
+    def co_occurrence(self,skill: str, job_role: Optional[str] = None, location: Optional[str] = None) -> pd.DataFrame:
+        #For the postings asking for skill, the number and share of them asking for each other skill (E.g. co_occurrence("spark"))
+        filters, parameters = self.role_filters(job_role,location)
+        in_search = f" AND a.job_id IN (SELECT job_id FROM posting_roles WHERE {filters})" if parameters else ""
+        counts = pd.read_sql_query(f"SELECT b.skill, COUNT(*) AS postings FROM posting_skills a JOIN posting_skills b ON b.job_id = a.job_id "\
+                                   f"WHERE a.skill = ? AND b.skill != a.skill{in_search} GROUP BY b.skill",\
+                                   self.connection(),params = [skill] + parameters)
+        total = self.connection().execute(f"SELECT COUNT(*) FROM posting_skills a WHERE a.skill = ?{in_search}",[skill] + parameters).fetchone()[0]
+        counts["share"] = counts["postings"]/total if total else 0.0
+        return counts.sort_values(["postings","skill"],ascending = [False,True],ignore_index = True)
+
+    def job_ids(self,skills: list, job_role: Optional[str] = None, location: Optional[str] = None) -> list:
+        #job_ids of the postings asking for every skill given
+        filters, parameters = self.role_filters(job_role,location)
+        queries = ["SELECT job_id FROM posting_skills WHERE skill = ?"]*len(skills)
+        if parameters: queries.append(f"SELECT job_id FROM posting_roles WHERE {filters}")
+        return [job_id for (job_id,) in self.connection().execute(" INTERSECT ".join(queries) + " ORDER BY job_id",list(skills) + parameters)]
+
+    def search(self,query: str, job_role: Optional[str] = None, location: Optional[str] = None) -> list:
+        #job_ids of the postings whose description matches a FTS5 query, best match first (E.g. search('"visa sponsorship"'))
+        if not self.full_text: raise RuntimeError("The sqlite of this python install was built without FTS5")
+        filters, parameters = self.role_filters(job_role,location)
+        in_search = f" AND job_id IN (SELECT job_id FROM posting_roles WHERE {filters})" if parameters else ""
+        return [job_id for (job_id,) in self.connection().execute(f"SELECT job_id FROM description_text WHERE description_text MATCH ?"\
+                                                                  f"{in_search} ORDER BY rank",[query] + parameters)]
+
+    @staticmethod
+    def role_filters(job_role: Optional[str], location: Optional[str]):
+        filters, parameters = [], []
+        for (condition,value) in [("job_role = ?",job_role),("location = ?",location)]:
+            if value is not None:
+                filters.append(condition)
+                parameters.append(value)
+        return " AND ".join(filters) or "1", parameters
+
+# Indexes the csvs of an earlier scrape (E.g. "Scrapped Data") and prints the skills asked for by each job role
+if __name__ == '__main__':
+    directory = sys.argv[1] if len(sys.argv) > 1 else os.getcwd()
+    location = sys.argv[2] if len(sys.argv) > 2 else "Singapore"
+    description_index = DescriptionIndex()
+    job_roles = []
+    for filename in sorted(glob.glob(f"{directory}/*_extracted_data.csv")):
+        if filename.endswith("companies_extracted_data.csv"): continue
+        job_role = os.path.basename(filename).replace("_extracted_data.csv","").replace("_"," ").title()
+        df = pd.read_csv(filename,dtype = str).reindex(columns = DATA_COLUMN_NAMES)
+        df = df.astype(object).where(df.notna(),None)
+        print(f"{job_role} : {description_index.add_rows(df.values.tolist(),job_role,location)} descriptions tokenized")
+        job_roles.append(job_role)
+    for job_role in job_roles:
+        print(f"\n{job_role}\n{description_index.skill_counts(job_role,location).head(10).round(3).to_string(index = False)}")
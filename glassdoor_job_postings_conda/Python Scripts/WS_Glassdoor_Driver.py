@@ -39,38 +39,151 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.action_chains import ActionChains
 from selenium.webdriver.common.alert import Alert
+from selenium.common.exceptions import TimeoutException
 import time
 import os
 from typing import Optional,List
 from dotenv import find_dotenv,load_dotenv
 import pandas as pd
+import re
+from WS_Checkpoint import CheckpointStore
+from WS_Job_Index import JobIndex
+from WS_Company_Cache import CompanyCache, COMPANY_COLUMN_NAMES
+from WS_Rate_Limiter import RequestBudget
+from WS_Metrics import Metrics
 
 driver_path = os.getcwd()+ "/chromedriver" #ChromeDriver needs to be in current working directory for the script to work
 load_dotenv(find_dotenv()) #Need to create a dotenv file to store login details.
 username_email = os.environ.get("USERNAME_EMAIL")
 password = os.environ.get("PASSWORD")
+GLASSDOOR_URL = os.environ.get("GLASSDOOR_URL","https://www.glassdoor.com/") #Can point to a WS_Replay_Server.py for benchmarks
+USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36"
+
+#Titles of the pages shown instead of glassdoor when we are sending requests too fast
+THROTTLED_TITLE = r"too many requests|rate limit|access denied|just a moment|\b(?:429|503)\b|^error$"
+
+#Columns of each row in GlassdoorDriver.data, in the order they are appended
+DATA_COLUMN_NAMES = ["job_id","job_name", "job_location","job_age", "job_posting_description",\
+                     "job_salary_range", "job_salary_estimate_type", "company",\
+                     "company_total_rating", "proportion_reviewers_recommend_company", \
+                     "company_individual_ratings", "company_type_size_sector_industry_yearFounded"]
+#Columns that belong to the job posting itself. The rest (COMPANY_COLUMN_NAMES) belong to the company.
+POSTING_COLUMN_NAMES = DATA_COLUMN_NAMES[:8]
+
+def search_page_url(search_url: str, page_number: int) -> str:
+    #Glassdoor encodes the page of a search in the url as "_IP{page_number}" right before ".htm"
+    base_url = re.sub(r"_IP\d+(?=\.htm)","",search_url)
+    if page_number == 1: return base_url
+    return re.sub(r"\.htm",f"_IP{page_number}.htm",base_url,count = 1)
+
+#Javascript that collects every field of the job posting currently shown in one call to chromedriver. It looks up the same
+#elements as extract_data_from_current_job_posting, but a section that is missing is returned as null straight away
+#instead of waiting for it to time out. Returns null if the article of the job posting is not loaded yet.
+EXTRACT_JOB_POSTING_SCRIPT = """
+const text = (element) => element ? (element.innerText ?? element.textContent).trim() : null;
+const jdCol = document.getElementById("JDCol");
+const article = jdCol ? jdCol.querySelector("article") : null;
+if (!article) return null;
+const jobId = article.getAttribute("data-id");
+const byId = (prefix) => document.getElementById(prefix + jobId);
+const salary = byId("job-salary-");
+const jobDescription = byId("JobDesc");
+const employerStats = document.getElementById("employerStats");
+const individualRatings = article.querySelector(".erz4gkm0");
+const basicInfo = document.getElementById("EmpBasicInfo");
+const overviewItems = {};
+if (basicInfo) {
+    for (const overviewElement of basicInfo.getElementsByClassName("e1pvx6aw0")) {
+        const spans = overviewElement.getElementsByTagName("span");
+        if (spans.length >= 2) overviewItems[text(spans[0])] = text(spans[1]);
+    }
+}
+const overview = (name) => overviewItems[name] ?? null;
+return {
+    job_id: jobId,
+    job_name: text(byId("job-title-")),
+    job_location: text(byId("job-location-")),
+    job_age: text(document.querySelector(".selected .listing-age")),
+    job_posting_description: jobDescription ? text(jobDescription.querySelector(".jobDescriptionContent")) : null,
+    job_salary_range: text(salary),
+    job_salary_estimate_type: salary ? text(salary.querySelector(".salary-estimate-type")) : null,
+    company: text(byId("job-employer-")),
+    company_total_rating: employerStats ? text(Array.from(employerStats.getElementsByClassName("e1pr2f4f1"))
+        .find((e) => e.getAttribute("data-test") === "rating-info")) : null,
+    proportion_reviewers_recommend_company: employerStats ? text(employerStats.querySelector(".css-ztsow4 text")) : null,
+    company_individual_ratings: individualRatings ?
+        Array.from(individualRatings.getElementsByClassName("erz4gkm1")).map(text) : null,
+    company_type_size_sector_industry_yearFounded: [overview("Type"), overview("Size"), overview("Sector"),
+                                                    overview("Industry"), overview("Founded")]
+};
+"""
+
+class WaitProfile:
+    #Records how long every explicit wait actually blocked, grouped by the site (place in the code) that waited.
+    #This shows where the wall-clock time of a run goes, so that the timeouts can be tuned from data.
+    def __init__(self):
+        self.records = [] #List of (site, seconds blocked, timed out?)
+
+    def record(self,site: str, seconds: float, timed_out: bool):
+        self.records.append((site,seconds,timed_out))
+
+    def extend(self,records: list):
+        #Adds records collected somewhere else (E.g. by another worker process)
+        self.records.extend(records)
+
+    def report(self) -> pd.DataFrame:
+        df = pd.DataFrame(self.records,columns = ["site","seconds","timed_out"])
+        report = df.groupby("site").agg(waits = ("seconds","size"), timeouts = ("timed_out","sum"),\
+                                        total_seconds = ("seconds","sum"), mean_seconds = ("seconds","mean"),\
+                                        p95_seconds = ("seconds",lambda x: x.quantile(0.95)), max_seconds = ("seconds","max"))
+        return report.sort_values("total_seconds",ascending = False)
+
+    def save(self,file_name: str):
+        self.report().to_csv(f"{os.getcwd()}/{file_name}")
 
 class DriverImproved(webdriver.Chrome):
-    #Include some methods to allow explicit waits
-    def find_element_EW(self,by='id', value: Optional[str] = None, seconds = 60,type = "presence") -> webdriver.remote.webelement.WebElement:
+    #Include some methods to allow explicit waits. There is no implicit wait, every wait is an explicit condition on the page
+    #and is timed in self.wait_profile under the name of its site.
+    wait_profile = None
+    metrics = None
+
+    def wait_until(self,condition, seconds = 60, site: str = "unnamed"):
+        if self.wait_profile is None: self.wait_profile = WaitProfile()
+        if self.metrics is None: self.metrics = Metrics()
+        start = time.perf_counter()
+        try:
+            result = WebDriverWait(self,seconds,poll_frequency = 0.1).until(condition)
+        except TimeoutException as e:
+            self.wait_profile.record(site,time.perf_counter() - start,True)
+            self.metrics.emit("wait",site = site,seconds = round(time.perf_counter() - start,4),timed_out = True)
+            raise e
+        self.wait_profile.record(site,time.perf_counter() - start,False)
+        self.metrics.emit("wait",site = site,seconds = round(time.perf_counter() - start,4),timed_out = False)
+        return result
+
+    def find_element_EW(self,by='id', value: Optional[str] = None, seconds = 60,type = "presence", site: Optional[str] = None) -> webdriver.remote.webelement.WebElement:
+        site = site or value
         if type == "presence":
-            element = WebDriverWait(self, seconds).until(EC.presence_of_element_located((by, value)))
+            element = self.wait_until(EC.presence_of_element_located((by, value)),seconds,site)
         elif type == "clickable":
-            element = WebDriverWait(self, seconds).until(EC.element_to_be_clickable((by,value)))
+            element = self.wait_until(EC.element_to_be_clickable((by,value)),seconds,site)
         return element
         
-    def find_all_elements_EW(self,by='id', value: Optional[str] = None, seconds = 20) -> List[webdriver.remote.webelement.WebElement]:
-        elements = WebDriverWait(self,seconds).until(EC.presence_of_all_elements_located((by,value)))
+    def find_all_elements_EW(self,by='id', value: Optional[str] = None, seconds = 20, site: Optional[str] = None) -> List[webdriver.remote.webelement.WebElement]:
+        elements = self.wait_until(EC.presence_of_all_elements_located((by,value)),seconds,site or value)
         return elements
 
 # First, we create a class for glassdoor website. Using inspect on the website, we will design the methods of these classes
 class GlassdoorDriver(DriverImproved):
-    def __init__(self,driver_path,url):
+    def __init__(self,driver_path,url,wait_profile: Optional[WaitProfile] = None, extraction_mode: str = "script",\
+                 metrics: Optional[Metrics] = None):
+        #extraction_mode "script" collects every field of a job posting with one execute_script call.
+        #extraction_mode "elements" looks up every field with its own selenium call (the original way).
         #The following code snippet for this __init__ method is taken directly from the following youtube video:
         #https://www.youtube.com/watch?v=LN1a0JoKlX8
         #Title: How to run Selenium Headless with Python | Python Headless Snippet | 2020
         #By Rajsuthan Official
-        user_agent = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36"
+        user_agent = USER_AGENT
         self.options = webdriver.ChromeOptions()
         self.options.add_argument('--headless')
         self.options.add_argument(f'user-agent={user_agent}')
@@ -85,90 +198,121 @@ class GlassdoorDriver(DriverImproved):
         self.options.add_argument('--disable-dev-shm-usage')
         self.options.add_argument('--no-sandbox')
         #End of snippet taken from Rajsuthan Official
+        self.wait_profile = wait_profile or WaitProfile()
+        self.metrics = metrics or Metrics() #Stage timers, waits, retries and postings, as JSON lines (see WS_Metrics.py)
         super().__init__(service = ChromeService(executable_path=driver_path),options = self.options)
-        self.implicitly_wait(10)
         self.get(url)
         self.job_search = None
+        self.location = None
+        self.search_url = None #Url of page 1 of the current search, used to jump straight to any page
         self.data = []
+        self.extraction_mode = extraction_mode
+        self.checkpoint_store = None #If set, every row is also appended to the checkpoint store as soon as it is extracted
+        self.known_job_ids = set() #Job postings of the current search that are already extracted, and are skipped
+        self.job_index = None #If set, a JobIndex shared with other workers, so that a posting is only extracted under one search
+        self.company_cache = None #If set, a CompanyCache, so that the profile of a company is only extracted once
+        self.incremental_database = None #If set, a GlassdoorDatabase of earlier runs. Postings already in it are not opened again.
+        self.request_budget = None #If set, a RequestBudget shared with other workers, which every request and retry goes through
+        self.page_number = None
     
     def login(self):
         #Login into account
-        time.sleep(1)
-        self.find_element_EW(value = "SignInButton").click()
-        self.find_element_EW(value = "modalUserEmail").send_keys(username_email,Keys.RETURN)
-        self.find_element_EW(value = "modalUserPassword").send_keys(password,Keys.RETURN)
+        with self.metrics.stage("login"):
+            self.find_element_EW(value = "SignInButton",type = "clickable").click()
+            self.find_element_EW(value = "modalUserEmail").send_keys(username_email,Keys.RETURN)
+            self.find_element_EW(value = "modalUserPassword").send_keys(password,Keys.RETURN)
 
     def go_to_jobs(self):
-        #Jobs Search
-        time.sleep(3)
-        link_buttons = self.find_element_EW(value = "ContentNav").find_elements(By.TAG_NAME,"li")
-        jobs_button = list(filter(lambda e: e.get_attribute("data-test") == "site-header-jobs",link_buttons))[0]
-        jobs_button.click()
+        #Jobs Search (Waits for the jobs button to be clickable, which also means that the login has gone through)
+        with self.metrics.stage("go-to-jobs"):
+            self.find_element_EW(By.CSS_SELECTOR,'#ContentNav li[data-test="site-header-jobs"]',type = "clickable",\
+                                 site = "site-header-jobs").click()
+
+    def retry(self,action, attempts: int = 3, on_retry = None, request: bool = True, site: str = "unnamed"):
+        #Calls action() until it does not raise, at most attempts times, calling on_retry() before every new attempt.
+        #Every failed attempt that is retried is counted in self.metrics under site.
+        #If request is True (the action loads something from glassdoor) and there is a request_budget, every attempt takes a token
+        #from it first, its outcome is reported to it, and retries wait for a backoff that grows as the shared rate goes down.
+        #Only timeouts and throttling pages count as throttled. Other errors (E.g. a stale element) do not slow the other workers down.
+        budget = self.request_budget if request else None
+        for attempt in range(attempts):
+            if budget is not None: budget.acquire()
+            start = time.perf_counter()
+            try:
+                result = action()
+            except Exception as e:
+                if budget is not None: budget.record_failure(self.is_throttled(e))
+                if attempt == attempts - 1: raise e
+                self.metrics.emit("retry",site = site,attempt = attempt + 1,error = type(e).__name__)
+                if on_retry is not None: on_retry()
+                if budget is not None: time.sleep(budget.backoff_seconds(attempt))
+                continue
+            if budget is not None: budget.record_success(time.perf_counter() - start)
+            return result
+
+    def is_throttled(self,error: Exception) -> bool:
+        #A page that did not load in time, or a page telling us to slow down (E.g. a 429/503 error page)
+        if isinstance(error,TimeoutException): return True
+        try:
+            return re.search(THROTTLED_TITLE,self.title or "",re.IGNORECASE) is not None
+        except Exception:
+            return False
 
     def search_job_role(self,job_role:str, location: str):
         #Search full-time job postings in singapore of the input job role and location
-        for i in range(3):
-            try:
-                a_tag_items = self.find_element_EW(value = "app-navigation").find_elements(By.TAG_NAME,"a")
-                search_button = list(filter(lambda e: e.get_attribute("data-test") == "jobs-search-results-page-link",a_tag_items))[0]
-                search_button.click()
-                time.sleep(3)
-                break
-            except Exception as e:
-                if i != 2:
-                    self.check_popups_and_try_to_close()
-                    continue
-                else:raise e
+        self.retry(lambda: self.find_element_EW(By.CSS_SELECTOR,'#app-navigation a[data-test="jobs-search-results-page-link"]',\
+                                                type = "clickable",site = "jobs-search-results-page-link").click(),\
+                   on_retry = self.check_popups_and_try_to_close,site = "jobs-search-results-page-link")
 
         #Job role
-        for i in range(3):
-            try:
-                job_role_search_bar = self.find_element_EW(value = "searchBar-jobTitle")
-                job_role_search_bar.clear()
-                job_role_search_bar.send_keys(job_role)
-                time.sleep(3)
-                break
-            except Exception as e:
-                if i != 2:
-                    self.check_popups_and_try_to_close()
-                    continue
-                else:raise e
+        def enter_job_role():
+            job_role_search_bar = self.find_element_EW(value = "searchBar-jobTitle",type = "clickable")
+            job_role_search_bar.clear()
+            job_role_search_bar.send_keys(job_role)
+            self.wait_until(lambda d: job_role_search_bar.get_attribute("value") == job_role,10,"searchBar-jobTitle-value")
+            return job_role_search_bar
+        job_role_search_bar = self.retry(enter_job_role,on_retry = self.check_popups_and_try_to_close,request = False,\
+                                         site = "searchBar-jobTitle")
 
         #location
-        for i in range(3):
-            try:
-                location_search_bar = self.find_element_EW(value = "searchBar-location")
-                #Use ctrl instead of command if using windows. I use macbook.
-                ActionChains(self).move_to_element(location_search_bar).click()\
-                    .key_down(Keys.COMMAND).send_keys("a",Keys.BACKSPACE).key_up(Keys.COMMAND).send_keys(location).perform()
-                job_role_search_bar.send_keys(Keys.RETURN)
-                break
-            except Exception as e:
-                if i != 2:continue
-                else:raise e
+        def enter_location_and_search():
+            location_search_bar = self.find_element_EW(value = "searchBar-location")
+            #Use ctrl instead of command if using windows. I use macbook.
+            ActionChains(self).move_to_element(location_search_bar).click()\
+                .key_down(Keys.COMMAND).send_keys("a",Keys.BACKSPACE).key_up(Keys.COMMAND).send_keys(location).perform()
+            self.wait_until(lambda d: location_search_bar.get_attribute("value") == location,10,"searchBar-location-value")
+            first_posting_tab = self.get_first_posting_tab()
+            job_role_search_bar.send_keys(Keys.RETURN)
+            return first_posting_tab
+        first_posting_tab = self.retry(enter_location_and_search,site = "searchBar-location")
+
+        self.wait_for_new_listing(first_posting_tab,"search-results")
 
         #Filter full-time
-        for i in range(3):
-            try:
-                self.find_element_EW(value = "filter_jobType",type = "clickable").click()
-                break
-            except Exception as e:
-                if i != 2:
-                    self.check_popups_and_try_to_close()
-                    continue
-                else:raise e
-        for i in range(3):
-            try:
-                button_elements = self.find_all_elements_EW(By.TAG_NAME,"button")
-                full_time_jobs_button = list(filter(lambda e: e.get_attribute("value") == "fulltime",button_elements))[0]
-                full_time_jobs_button.click()
-                break
-            except Exception as e:
-                if i != 2:
-                    self.check_popups_and_try_to_close()
-                    time.sleep(2)
-                    continue
-                else:raise e
+        self.retry(lambda: self.find_element_EW(value = "filter_jobType",type = "clickable").click(),\
+                   on_retry = self.check_popups_and_try_to_close,request = False,site = "filter_jobType")
+        def click_fulltime():
+            first_posting_tab = self.get_first_posting_tab()
+            self.find_element_EW(By.CSS_SELECTOR,'button[value="fulltime"]',type = "clickable",site = "fulltime-button").click()
+            return first_posting_tab
+        first_posting_tab = self.retry(click_fulltime,on_retry = self.check_popups_and_try_to_close,site = "fulltime-button")
+        self.wait_for_new_listing(first_posting_tab,"fulltime-results")
+
+    def get_postings_tabs(self) -> List[webdriver.remote.webelement.WebElement]:
+        #This function returns a list of posting elements (left side of web page)
+        return self.find_all_elements_EW(By.CSS_SELECTOR,"#MainCol .react-job-listing",site = "react-job-listing")
+
+    def get_first_posting_tab(self) -> Optional[webdriver.remote.webelement.WebElement]:
+        #Returns the first posting element currently shown without waiting, or None if there is no listing on the page
+        posting_elements = self.find_elements(By.CSS_SELECTOR,"#MainCol .react-job-listing")
+        return posting_elements[0] if posting_elements else None
+
+    def wait_for_new_listing(self,old_posting_tab, site: str):
+        #Waits for the posting tabs of the previous listing (if any) to be replaced, and for the new listing to be shown
+        if old_posting_tab is not None:
+            self.wait_until(EC.staleness_of(old_posting_tab),30,site)
+        self.get_postings_tabs()
+        self.find_element_EW(By.CLASS_NAME,"paginationFooter",seconds = 30)
 
     def check_popups_and_try_to_close(self):
         #Check Job Alert
@@ -193,150 +337,243 @@ class GlassdoorDriver(DriverImproved):
     
     def go_to_next_page_of_job_postings(self):
         #Goes to the next page of job postings
-        try:
-            self.find_element_EW(By.CLASS_NAME,value = "nextButton").click()
-        except Exception as e:
-            self.check_popups_and_try_to_close()
-            time.sleep(5)
-            self.find_element_EW(By.CLASS_NAME,value = "nextButton").click()
+        with self.metrics.stage("page-load"):
+            first_posting_tab = self.get_first_posting_tab()
+            self.retry(lambda: self.find_element_EW(By.CLASS_NAME,value = "nextButton",type = "clickable").click(),attempts = 2,\
+                       on_retry = self.check_popups_and_try_to_close,site = "nextButton")
+            self.wait_for_new_listing(first_posting_tab,"next-page-results")
+
+    def page_url(self,page_number: int) -> str:
+        return search_page_url(self.search_url,page_number)
+
+    def go_to_page(self,page_number: int):
+        #Goes straight to the specified page of the current search, instead of clicking through every page before it
+        current_page,_ = self.get_page_numbers()
+        if current_page == page_number: return
+        def load_page():
+            self.get(self.page_url(page_number))
+            self.get_postings_tabs()
+        with self.metrics.stage("page-load"):
+            self.retry(load_page,site = "go-to-page")
+
+    def start_search(self,job_role: str, location: str) -> str:
+        #Searches the job role and location, and remembers the url of page 1 of the search results
+        with self.metrics.stage("search"):
+            self.search_job_role(job_role,location)
+        self.job_search,self.location = job_role,location
+        self.search_url = self.current_url
+        #Postings extracted under an earlier search of this driver are not skipped under this one
+        self.known_job_ids = self.checkpoint_store.job_ids(job_role,location) if self.checkpoint_store is not None else set()
+        return self.search_url
+
+    def scrape_page(self,job_role: str, location: str, page_number: int, on_last_page_number = None):
+        #Scrapes a single page of a search and returns the rows collected together with the total number of pages.
+        #The search is only redone when the job role or location changes, so a logged in driver can be reused
+        #for many pages and many searches.
+        #on_last_page_number is called with the total number of pages as soon as the page is shown, before any posting
+        #is extracted, so that the other pages of the search can be handed out to other drivers straight away.
+        if (job_role,location) != (self.job_search,self.location):
+            self.start_search(job_role,location)
+        self.go_to_page(page_number)
+        _,last_page_number = self.get_page_numbers()
+        if on_last_page_number is not None: on_last_page_number(last_page_number)
+        self.data = []
+        self.extract_job_posting_data_from_page(page_number)
+        return self.data,last_page_number
+
+    def iter_pages(self,job_role: str, location: str):
+        #Searches the job role and location, then yields (page_number, rows of the page) for every page, one page at a time
+        self.start_search(job_role,location)
+        current_page_number,last_page_number = self.get_page_numbers() #Read once, the number of pages does not change
+        while True:
+            self.data = []
+            self.extract_job_posting_data_from_page(current_page_number)
+            yield current_page_number,self.data
+            if current_page_number == last_page_number: break
+            self.go_to_next_page_of_job_postings()
+            current_page_number += 1
+
+    def extract_data_from_current_job_posting_with_script(self) -> bool:
+        # Same as extract_data_from_current_job_posting, but in a single round trip to chromedriver.
+        # Returns False if the job posting is not loaded yet, so that the caller can fall back to waiting for it.
+        job_posting = self.execute_script(EXTRACT_JOB_POSTING_SCRIPT)
+        if job_posting is None: return False
+        if not (job_posting["job_name"] and job_posting["company"]):
+            raise Exception(f"Job posting {job_posting['job_id']} is not fully loaded")
+        #The company fields come for free with the same call, so the cache is only filled here, not read
+        if self.company_cache is not None and self.company_cache.get(job_posting["company"]) is None:
+            self.company_cache.put(job_posting["company"],job_posting)
+        self.add_row([job_posting[column_name] for column_name in DATA_COLUMN_NAMES])
+        return True
+
+    def add_row(self,row: list):
+        self.metrics.emit("posting",job_id = row[0],job_role = self.job_search,location = self.location,page_number = self.page_number)
+        self.data.append(row)
+        self.known_job_ids.add(row[0])
+        if self.checkpoint_store is not None:
+            self.checkpoint_store.append_row(self.job_search,self.location,self.page_number,row)
 
     def extract_data_from_current_job_posting(self):
         # Assume we have already click the job on the left hand side of the page.
         # Then, now we just have to look at the article on the right and extract information
         # Not all postings have the information we want. In those cases we will fill the value with None
-        for i in range(3):
+        if self.extraction_mode == "script" and self.extract_data_from_current_job_posting_with_script(): return
+        def extract():
+            #Getting article elements which contians most of the information we want
+            jd_col_element = self.find_element_EW(value = "JDCol")
             try:
-                #Getting article elements which contians most of the information we want
-                jd_col_element = self.find_element_EW(value = "JDCol")
-                try:
-                    article_element = jd_col_element.find_element(By.TAG_NAME,"article")
-                except Exception as e:
-                    #Sometimes, article element cannot be found. In which case, we will need check which 
-                    #of the 2 following scenarios are occuring:
+                article_element = jd_col_element.find_element(By.TAG_NAME,"article")
+            except Exception as e:
+                #Sometimes, article element cannot be found. In which case, we will need check which 
+                #of the 2 following scenarios are occuring:
                     
-                    #Scenario 1: Error loading. (Solution is to reload)
-                    try:
-                        button_elements = jd_col_element.find_elements(By.TAG_NAME, "button")
-                        retry_loading_button = list(filter(lambda x: x.text == "Retry your search",button_elements))[0]
-                        retry_loading_button.click()
-                        
-                    #Scenario 2: Webpage is loading (Solution is to wait)
-                    except:
-                        time.sleep(5)
-                    finally:
-                        jd_col_element = self.find_element_EW(value = "JDCol")
-                        article_element = jd_col_element.find_element(By.TAG_NAME,"article")
-                ##
-
-                job_id = article_element.get_attribute("data-id")
-                job_name = self.find_element_EW(value = f"job-title-{job_id}").text
-                job_location = self.find_element_EW(value = f"job-location-{job_id}").text
-                company = self.find_element_EW(value = f"job-employer-{job_id}").text               
-                job_age = self.find_element_EW(By.CLASS_NAME,"selected").find_element(By.CLASS_NAME,"listing-age").text
-                job_posting_description = self.find_element_EW(value = f"JobDesc{job_id}").\
-                    find_element(By.CLASS_NAME,"jobDescriptionContent").text
-                
-                #Salary
-                try:
-                    job_salary_range = self.find_element_EW(value = f"job-salary-{job_id}",seconds=5).text
-                    job_salary_estimate_type = self.find_element_EW(value = f"job-salary-{job_id}",seconds=5).find_element(By.CLASS_NAME,"salary-estimate-type").text
-                except Exception as E:
-                    job_salary_range = None
-                    job_salary_estimate_type = None
-
-                #Company total rating
-                try:
-                    employer_stats_element = self.find_element_EW(value = "employerStats",seconds=5)
-                    company_total_rating = list(filter(lambda x: x.get_attribute("data-test")=="rating-info", employer_stats_element.find_elements(By.CLASS_NAME,"e1pr2f4f1")))[0].text
-                except:
-                    company_total_rating = None
-
-                #Proportion recommended to friend
+                #Scenario 1: Error loading. (Solution is to reload)
                 try:
-                    employer_stats_element = self.find_element_EW(value = "employerStats",seconds=5)
-                    proportion_reviewers_recommend_company = employer_stats_element.find_element(By.CLASS_NAME,"css-ztsow4").find_element(By.TAG_NAME,"text").text
-                except:
-                    proportion_reviewers_recommend_company = None
-
-                #Company Individual Ratings
-                try:
-                    company_individual_ratings_element = article_element.find_element(By.CLASS_NAME,"erz4gkm0").find_elements(By.CLASS_NAME,"erz4gkm1")
-                    company_individual_ratings = [e.text for e in company_individual_ratings_element]
-                except:
-                    company_individual_ratings = None
-
-                #Company type/Size/Sector/Industry
-                try:
-                    def get_company_overview_info(company_overview_element):
-                        temp = company_overview_element.find_elements(By.TAG_NAME,"span")
-                        variable_name = temp[0].text
-                        value = temp[1].text
-                        return (variable_name,value)
-                    company_overview_elements = self.find_element_EW(value = "EmpBasicInfo",seconds=5).find_elements(By.CLASS_NAME,"e1pvx6aw0")
-                    overview_items = {variable_name:value for (variable_name,value) in [get_company_overview_info(i) for i in company_overview_elements]}
-                    company_type_size_sector_industry_yearFounded = [overview_items.get("Type",None),\
-                                                         overview_items.get("Size",None),\
-                                                         overview_items.get("Sector",None),\
-                                                         overview_items.get("Industry",None),\
-                                                         overview_items.get("Founded",None)]
+                    button_elements = jd_col_element.find_elements(By.TAG_NAME, "button")
+                    retry_loading_button = list(filter(lambda x: x.text == "Retry your search",button_elements))[0]
+                    retry_loading_button.click()
+                        
+                #Scenario 2: Webpage is loading (Solution is to wait for the article to appear)
                 except:
-                    company_type_size_sector_industry_yearFounded = [None, None, None, None,None]
+                    pass
+                finally:
+                    article_element = self.find_element_EW(By.CSS_SELECTOR,"#JDCol article",seconds = 10,site = "JDCol-article")
+            ##
+
+            job_id = article_element.get_attribute("data-id")
+            job_name = self.find_element_EW(value = f"job-title-{job_id}",site = "job-title").text
+            job_location = self.find_element_EW(value = f"job-location-{job_id}",site = "job-location").text
+            company = self.find_element_EW(value = f"job-employer-{job_id}",site = "job-employer").text               
+            job_age = self.find_element_EW(By.CLASS_NAME,"selected").find_element(By.CLASS_NAME,"listing-age").text
+            job_posting_description = self.find_element_EW(By.CSS_SELECTOR,f"#JobDesc{job_id} .jobDescriptionContent",\
+                                                           site = "jobDescriptionContent").text
+                
+            #Salary
+            try:
+                job_salary_range = self.find_element_EW(value = f"job-salary-{job_id}",seconds=5,site = "job-salary").text
+                job_salary_estimate_type = self.find_element_EW(value = f"job-salary-{job_id}",seconds=5,site = "job-salary").find_element(By.CLASS_NAME,"salary-estimate-type").text
+            except Exception as E:
+                job_salary_range = None
+                job_salary_estimate_type = None
+
+            #Company profile, unless the company is already in the cache
+            company_profile = self.company_cache.get(company) if self.company_cache is not None else None
+            if company_profile is None:
+                company_profile = self.extract_company_profile(article_element)
+                if self.company_cache is not None: self.company_cache.put(company,company_profile)
+            company_total_rating, proportion_reviewers_recommend_company, \
+                company_individual_ratings, company_type_size_sector_industry_yearFounded = \
+                [company_profile[column_name] for column_name in COMPANY_COLUMN_NAMES]
+
+            self.add_row([job_id,job_name, job_location,job_age, job_posting_description,\
+                   job_salary_range, job_salary_estimate_type, company,\
+                   company_total_rating, proportion_reviewers_recommend_company, \
+                   company_individual_ratings, company_type_size_sector_industry_yearFounded])
+
+        def wait_for_article():
+            #Give the job posting time to load again before retrying
+            try:
+                self.find_element_EW(By.CSS_SELECTOR,"#JDCol article",seconds = 7.5,site = "JDCol-article-retry")
+            except TimeoutException:
+                pass
+        self.retry(extract,on_retry = wait_for_article,request = False,site = "job-posting-fields")
+
+    def extract_company_profile(self,article_element) -> dict:
+        #Extracts the company fields of the job posting currently shown. Returns a dictionary of COMPANY_COLUMN_NAMES.
+        #Company total rating
+        try:
+            employer_stats_element = self.find_element_EW(value = "employerStats",seconds=5)
+            company_total_rating = list(filter(lambda x: x.get_attribute("data-test")=="rating-info", employer_stats_element.find_elements(By.CLASS_NAME,"e1pr2f4f1")))[0].text
+        except:
+            company_total_rating = None
 
-                self.data.append([job_id,job_name, job_location,job_age, job_posting_description,\
-                       job_salary_range, job_salary_estimate_type, company,\
-                       company_total_rating, proportion_reviewers_recommend_company, \
-                       company_individual_ratings, company_type_size_sector_industry_yearFounded])
-                break
-            except Exception as e:
+        #Proportion recommended to friend
+        try:
+            employer_stats_element = self.find_element_EW(value = "employerStats",seconds=5)
+            proportion_reviewers_recommend_company = employer_stats_element.find_element(By.CLASS_NAME,"css-ztsow4").find_element(By.TAG_NAME,"text").text
+        except:
+            proportion_reviewers_recommend_company = None
 
-                if i != 2:
-                    time.sleep(7.5)
-                    continue
-                else:
-                    raise e
+        #Company Individual Ratings
+        try:
+            company_individual_ratings_element = article_element.find_element(By.CLASS_NAME,"erz4gkm0").find_elements(By.CLASS_NAME,"erz4gkm1")
+            company_individual_ratings = [e.text for e in company_individual_ratings_element]
+        except:
+            company_individual_ratings = None
 
-    def extract_job_posting_data_from_page(self):
-        def get_postings_tabs():
-            #This function returns a list of posting elements (left side of web page)
-            for i in range(3):
-                try:
-                    left_column = self.find_element_EW(value = "MainCol")
-                    posting_elements = left_column.find_elements(By.CLASS_NAME, "react-job-listing")
-                    return posting_elements
-                except Exception as e:
-                    if i != 2: 
-                        time.sleep(2)
-                        continue
-                    else: raise e
+        #Company type/Size/Sector/Industry
+        try:
+            def get_company_overview_info(company_overview_element):
+                temp = company_overview_element.find_elements(By.TAG_NAME,"span")
+                variable_name = temp[0].text
+                value = temp[1].text
+                return (variable_name,value)
+            company_overview_elements = self.find_element_EW(value = "EmpBasicInfo",seconds=5).find_elements(By.CLASS_NAME,"e1pvx6aw0")
+            overview_items = {variable_name:value for (variable_name,value) in [get_company_overview_info(i) for i in company_overview_elements]}
+            company_type_size_sector_industry_yearFounded = [overview_items.get("Type",None),\
+                                                 overview_items.get("Size",None),\
+                                                 overview_items.get("Sector",None),\
+                                                 overview_items.get("Industry",None),\
+                                                 overview_items.get("Founded",None)]
+        except:
+            company_type_size_sector_industry_yearFounded = [None, None, None, None,None]
+
+        return {"company_total_rating": company_total_rating,
+                "proportion_reviewers_recommend_company": proportion_reviewers_recommend_company,
+                "company_individual_ratings": company_individual_ratings,
+                "company_type_size_sector_industry_yearFounded": company_type_size_sector_industry_yearFounded}
+
+    def extract_job_posting_data_from_page(self,page_number: Optional[int] = None):
+        #page_number is the page currently shown. If it is not given, it is read from the page.
+        get_postings_tabs = self.get_postings_tabs
         
         def click_posting_tab(posting_number):
-            #Clicks the specified posting element from left side of web page
-            for k in range(3):
-                try:
-                    get_postings_tabs()[posting_number].click()
-                    break
-                except Exception as e:
-                    if k != 2:
-                        self.check_popups_and_try_to_close()
-                        time.sleep(4)
-                        continue
-                    else: raise e
+            #Clicks the specified posting element from left side of web page, and waits for its job posting to be shown
+            def click():
+                posting_tab = get_postings_tabs()[posting_number]
+                self.wait_until(EC.element_to_be_clickable(posting_tab),10,"react-job-listing-clickable").click()
+                job_id = posting_tab.get_attribute("data-id")
+                if job_id:
+                    self.find_element_EW(By.CSS_SELECTOR,f'#JDCol article[data-id="{job_id}"]',seconds = 20,\
+                                         site = "JDCol-article-selected")
+            with self.metrics.stage("tab-click"):
+                self.retry(click,on_retry = self.check_popups_and_try_to_close,site = "react-job-listing-click")
 
         number_of_postings = len(get_postings_tabs())
+        self.page_number = page_number or self.get_page_numbers()[0]
+        tab_listings = self.get_posting_tab_listings()
+        #Incremental mode: only the postings that are new (or were reposted) since the earlier runs are opened
+        job_ids_to_extract = self.incremental_database.update_from_listing([listing for listing in tab_listings if listing[0]],\
+                                                                           self.job_search,self.location) \
+                             if self.incremental_database is not None else None
 
         for i in range(number_of_postings):
+            tab_job_id = tab_listings[i][0] if i < len(tab_listings) else None
+
+            #Skip job postings that were already extracted (E.g. by a run that was stopped halfway)
+            if tab_job_id in self.known_job_ids:
+                continue
+            #Skip job postings that have not changed since an earlier run. Their age and scrape date are already updated.
+            if job_ids_to_extract is not None and tab_job_id and tab_job_id not in job_ids_to_extract:
+                continue
+            #Skip job postings already extracted under another search. Only the search it showed up under is recorded.
+            if self.job_index is not None and tab_job_id and not self.job_index.claim(tab_job_id,self.job_search,self.location):
+                continue
 
-            click_posting_tab(i)
+            try:
+                click_posting_tab(i)
+                with self.metrics.stage("field-extraction"):
+                    self.retry(self.extract_data_from_current_job_posting,on_retry = lambda: click_posting_tab(i),\
+                               request = False,site = "job-posting") #Clicking the tab again is kind of like refreshing
+            except Exception as e:
+                if self.job_index is not None and tab_job_id: self.job_index.release(tab_job_id)
+                raise e
+            if self.job_index is not None and tab_job_id: self.job_index.mark_extracted(tab_job_id)
 
-            for h in range(3):
-                try:
-                    self.extract_data_from_current_job_posting()
-                    break
-                except Exception as e:
-                    if h != 2:
-                        click_posting_tab(i) #kind of like refreshing
-                        continue
-                    else: raise e
+    def get_posting_tab_listings(self) -> List[list]:
+        #Reads the [job_id, job_age] of every posting tab on the left side of the page, in one call
+        return self.execute_script("return Array.from(document.querySelectorAll('#MainCol .react-job-listing')).map((e) => "\
+                                   "{const age = e.querySelector('.listing-age'); return [e.getAttribute('data-id'), age ? age.innerText.trim() : null];});")
 
     def scroll_to_view_page_number(self):
         #For debugging
@@ -345,40 +582,103 @@ class GlassdoorDriver(DriverImproved):
         ac = ActionChains(self).move_to_element(jd_col_element).scroll_to_element(page_seq)
         ac.perform()
 
-def scrape_job_role(job_role: str, location: str) -> GlassdoorDriver:
+def start_glassdoor_driver(wait_profile: Optional[WaitProfile] = None, metrics: Optional[Metrics] = None) -> GlassdoorDriver:
+    #Starts a headless chrome, logs in and goes to the jobs page. This is the fixed cost paid by every driver.
+    metrics = metrics or Metrics()
+    with metrics.stage("startup"):
+        glassdoor_driver = GlassdoorDriver(driver_path,GLASSDOOR_URL,wait_profile,metrics = metrics)
+    try:
+        glassdoor_driver.login()
+        glassdoor_driver.go_to_jobs()
+    except Exception as e:
+        #The caller never gets the driver back, so chrome has to be closed here, or every failed login leaves one running
+        glassdoor_driver.quit()
+        raise e
+    return glassdoor_driver
+
+def save_rows_as_csv(rows: list, job_role: str, company_cache: Optional[CompanyCache] = None):
+    #Export data collected into a csv, saving it into the current working directory.
+    #If a company_cache is given, only the job posting columns are saved. The company column links each row to the
+    #companies table, which is saved once with save_companies_as_csv instead of being repeated on every row.
+    df = pd.DataFrame(rows,columns=DATA_COLUMN_NAMES)
+    if company_cache is not None:
+        df = df[POSTING_COLUMN_NAMES]
+    job_role_formated = job_role.replace(" ","_")
+    df.to_csv(f"{os.getcwd()}/{job_role_formated}_extracted_data.csv")
+
+def save_companies_as_csv(company_cache: CompanyCache):
+    company_cache.companies().to_csv(f"{os.getcwd()}/companies_extracted_data.csv",index = False)
+
+def scrape_job_role(job_role: str, location: str, checkpoint_store: Optional[CheckpointStore] = None,\
+                    job_index: Optional[JobIndex] = None, company_cache: Optional[CompanyCache] = None,\
+                    database = None, incremental: bool = False, request_budget: Optional[RequestBudget] = None,\
+                    metrics: Optional[Metrics] = None) -> GlassdoorDriver:
+    #If a checkpoint_store is given, rows are saved as they are scraped, and a restarted run continues from
+    #the first page that is not finished, skipping the job postings that are already saved.
+    #If a job_index is given, job postings already extracted under another search are skipped.
+    #If a company_cache is given, company profiles are only extracted once, and are saved into their own csv.
+    #If a database (WS_Database.GlassdoorDatabase) is given, the rows are also upserted into it.
+    #If incremental is True, only the postings that are not in the database yet (or were reposted) are extracted, and once every
+    #page is done, postings of the search that are gone are marked closed in the database.
+    #If a request_budget is given, page loads and clicks are rate limited with it (see WS_Rate_Limiter.py).
+    #If metrics are given, the time of every stage, wait and retry is recorded into its JSON lines file (see WS_Metrics.py).
+    if incremental and database is None:
+        raise ValueError("incremental scrapes need a database to compare the postings with")
+    metrics = metrics or Metrics()
+    if checkpoint_store is not None and checkpoint_store.is_finished(job_role,location):
+        metrics.log(f"{job_role} : All pages already extracted")
+        rows = checkpoint_store.load_rows(job_role,location)
+        save_rows_as_csv(rows,job_role,company_cache)
+        if database is not None: database.upsert_rows(rows,job_role,location)
+        return None
     try:
-        glassdoor_driver = GlassdoorDriver(driver_path,"https://www.glassdoor.com/")
-        glassdoor_driver.job_search = job_role
+        with metrics.stage("startup"):
+            glassdoor_driver = GlassdoorDriver(driver_path,GLASSDOOR_URL,metrics = metrics)
+        glassdoor_driver.checkpoint_store = checkpoint_store
+        glassdoor_driver.job_index = job_index
+        glassdoor_driver.company_cache = company_cache
+        glassdoor_driver.incremental_database = database if incremental else None
+        glassdoor_driver.request_budget = request_budget
         glassdoor_driver.login()
-        print(f"Login successful for {job_role} search\n")
+        metrics.log(f"Login successful for {job_role} search")
         glassdoor_driver.go_to_jobs()
-        print(f"Go to jobs successful for {job_role} search\n")
-        glassdoor_driver.search_job_role(job_role,location)
-        print(f"Search Job role successful for {job_role} search\n")
+        metrics.log(f"Go to jobs successful for {job_role} search")
+        glassdoor_driver.start_search(job_role,location)
+        metrics.log(f"Search Job role successful for {job_role} search")
+        if checkpoint_store is not None:
+            glassdoor_driver.go_to_page(checkpoint_store.next_page(job_role,location))
 
         #Now, we cycle through the pages of the job postings.
-        time.sleep(5)
-        current_page_number, last_page_number = glassdoor_driver.get_page_numbers() #Indicates numbers of pages
+        current_page_number, last_page_number = glassdoor_driver.get_page_numbers() #Indicates numbers of pages (read once)
         #1st Page
         try:
-            glassdoor_driver.extract_job_posting_data_from_page()
-            print(f"{job_role} : Page {current_page_number} of {last_page_number} extracted: PASSED\n")
+            glassdoor_driver.extract_job_posting_data_from_page(current_page_number)
+            if checkpoint_store is not None:
+                checkpoint_store.finish_page(job_role,location,current_page_number,last_page_number)
+            metrics.log(f"{job_role} : Page {current_page_number} of {last_page_number} extracted: PASSED",event = "page",job_role = job_role,\
+                                location = location,page_number = current_page_number,last_page_number = last_page_number,status = "passed")
         except Exception as e:
-            print(f"{job_role} : Page {current_page_number} of {last_page_number} extracted: FAILED\n")
+            metrics.log(f"{job_role} : Page {current_page_number} of {last_page_number} extracted: FAILED",event = "page",job_role = job_role,\
+                                location = location,page_number = current_page_number,last_page_number = last_page_number,status = "failed")
             raise e
         #Rest of the pages
-        while glassdoor_driver.presence_next_page():
+        while current_page_number < last_page_number:
             try: 
                 glassdoor_driver.go_to_next_page_of_job_postings()
-                time.sleep(3)
-                current_page_number, last_page_number = glassdoor_driver.get_page_numbers()
-                glassdoor_driver.extract_job_posting_data_from_page()
-                print(f"{job_role} : Page {current_page_number} of {last_page_number} extracted: PASSED\n")
+                current_page_number += 1
+                glassdoor_driver.extract_job_posting_data_from_page(current_page_number)
+                if checkpoint_store is not None:
+                    checkpoint_store.finish_page(job_role,location,current_page_number,last_page_number)
+                metrics.log(f"{job_role} : Page {current_page_number} of {last_page_number} extracted: PASSED",event = "page",job_role = job_role,\
+                                    location = location,page_number = current_page_number,last_page_number = last_page_number,status = "passed")
             except Exception as e:
-                print(f"{job_role} : Page {current_page_number} of {last_page_number} extracted: FAILED\n")
+                metrics.log(f"{job_role} : Page {current_page_number} of {last_page_number} extracted: FAILED",event = "page",job_role = job_role,\
+                                    location = location,page_number = current_page_number,last_page_number = last_page_number,status = "failed")
                 glassdoor_driver.scroll_to_view_page_number()
                 glassdoor_driver.get_screenshot_as_file(f"error_{job_role}.png") #Will help in debugging, by showing at which point, an error comes up
                 raise e
+        if incremental:
+            metrics.log(f"{job_role} : {database.close_missing_postings(job_role,location)} job postings closed")
         glassdoor_driver.scroll_to_view_page_number()
         glassdoor_driver.get_screenshot_as_file(f"passed_{job_role}.png")
     except Exception as e:
@@ -386,14 +686,14 @@ def scrape_job_role(job_role: str, location: str) -> GlassdoorDriver:
         glassdoor_driver.get_screenshot_as_file(f"error_{job_role}.png") #Will help in debugging, by showing at which point, an error comes up
         raise e
     finally:
-        #Export data collected into a csv
-        df_column_names = ["job_id","job_name", "job_location","job_age", "job_posting_description",\
-                       "job_salary_range", "job_salary_estimate_type", "company",\
-                       "company_total_rating", "proportion_reviewers_recommend_company", \
-                       "company_individual_ratings", "company_type_size_sector_industry_yearFounded"]
-        df = pd.DataFrame(glassdoor_driver.data,columns=df_column_names)
-        job_role_formated = job_role.replace(" ","_")
-        df.to_csv(f"{os.getcwd()}/{job_role_formated}_extracted_data.csv")
+        #Export data collected into a csv (including rows saved by earlier runs), and how long each wait site blocked
+        rows = checkpoint_store.load_rows(job_role,location) if checkpoint_store is not None else glassdoor_driver.data
+        save_rows_as_csv(rows,job_role,company_cache)
+        if database is not None:
+            database.upsert_rows(rows,job_role,location)
+        if company_cache is not None:
+            save_companies_as_csv(company_cache)
+        glassdoor_driver.wait_profile.save(f"{job_role.replace(' ','_')}_wait_profile.csv")
 
         return glassdoor_driver
 
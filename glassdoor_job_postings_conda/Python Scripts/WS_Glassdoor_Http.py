@@ -0,0 +1,230 @@
+"""
+This script contains a second fetch engine for scraping glassdoor job postings, which uses httpx and parsel instead of selenium.
+
+With selenium, every field of a job posting is a round trip to chromedriver, and every worker needs a whole chrome running. Here, chrome
+is only used once, to login and to find the url of each search. After that, the login cookies are handed over to a pooled
+httpx.AsyncClient, which downloads the listing pages and the job posting pages as plain html. The html is then parsed with parsel,
+using the same element ids and class names that GlassdoorDriver uses. Each job posting becomes a row with the same 12 columns as
+GlassdoorDriver.data (see DATA_COLUMN_NAMES), so both engines can be used interchangeably.
+Both engines also record the same metrics (see WS_Metrics.py): every fetch is a "page-load" (listing) or "job-posting-load" stage,
+and every posting, page and retry is an event, so a run can be followed with python WS_Metrics.py metrics.jsonl --follow 30.
+"""
+
+import asyncio
+import re
+import time
+from typing import Optional,List
+from urllib.parse import urljoin
+import httpx
+from parsel import Selector, SelectorList
+from WS_Glassdoor_Driver import USER_AGENT, DATA_COLUMN_NAMES, search_page_url, start_glassdoor_driver
+from WS_Company_Cache import CompanyCache
+from WS_Rate_Limiter import RequestBudget
+from WS_Metrics import Metrics
+
+def get_text(selector: Selector, separator: Optional[str] = None) -> Optional[str]:
+    #Mimics the .text of a selenium element. By default, the text nodes inside the element are joined as they are and
+    #whitespace is collapsed. If a separator is given, each text node is stripped and joined with the separator instead
+    #(E.g. "\n" for the job description, where every paragraph is on its own line).
+    if isinstance(selector,SelectorList):
+        if not selector: return None
+        selector = selector[0]
+    texts = selector.xpath(".//text()").getall()
+    if separator is None:
+        return re.sub(r"\s+"," ","".join(texts)).strip()
+    return separator.join(text.strip() for text in texts if text.strip())
+
+def parse_page_numbers(selector: Selector):
+    #Gets current page and total number of pages of job posting (Same as GlassdoorDriver.get_page_numbers)
+    page_sequence = get_text(selector.css(".paginationFooter")).split()
+    return int(page_sequence[1]),int(page_sequence[3])
+
+def parse_listing(selector: Selector, page_url: str) -> List[tuple]:
+    #Returns (job_id, job_age, job_posting_url) for every posting tab on the left side of a listing page
+    postings = []
+    for posting_tab in selector.css("#MainCol .react-job-listing"):
+        job_id = posting_tab.attrib.get("data-id")
+        job_age = get_text(posting_tab.css(".listing-age"))
+        href = posting_tab.css("a::attr(href)").get() or f"/job-listing/?jl={job_id}"
+        postings.append((job_id, job_age, urljoin(page_url,href)))
+    return postings
+
+def parse_job_posting(selector: Selector, job_age: Optional[str]) -> list:
+    #Extracts the same fields as GlassdoorDriver.extract_data_from_current_job_posting from the html of a job posting.
+    #The age is only shown on the listing tab, so it is passed in.
+    article_element = selector.css("#JDCol article")
+    job_id = article_element.attrib.get("data-id")
+    job_name = get_text(selector.css(f"#job-title-{job_id}"))
+    job_location = get_text(selector.css(f"#job-location-{job_id}"))
+    company = get_text(selector.css(f"#job-employer-{job_id}"))
+    job_posting_description = get_text(selector.css(f"#JobDesc{job_id} .jobDescriptionContent"),separator = "\n")
+
+    #Salary
+    job_salary_range = get_text(selector.css(f"#job-salary-{job_id}"))
+    job_salary_estimate_type = get_text(selector.css(f"#job-salary-{job_id} .salary-estimate-type"))
+
+    #Company total rating
+    company_total_rating = get_text(selector.css('#employerStats .e1pr2f4f1[data-test="rating-info"]'))
+
+    #Proportion recommended to friend
+    proportion_reviewers_recommend_company = get_text(selector.css("#employerStats .css-ztsow4 text"))
+
+    #Company Individual Ratings
+    company_individual_ratings_element = article_element.css(".erz4gkm0")
+    if company_individual_ratings_element:
+        company_individual_ratings = [get_text(e) for e in company_individual_ratings_element.css(".erz4gkm1")]
+    else:
+        company_individual_ratings = None
+
+    #Company type/Size/Sector/Industry
+    overview_items = {}
+    for company_overview_element in selector.css("#EmpBasicInfo .e1pvx6aw0"):
+        temp = company_overview_element.css("span")
+        if len(temp) >= 2:
+            overview_items[get_text(temp[0])] = get_text(temp[1])
+    company_type_size_sector_industry_yearFounded = [overview_items.get("Type",None),\
+                                                     overview_items.get("Size",None),\
+                                                     overview_items.get("Sector",None),\
+                                                     overview_items.get("Industry",None),\
+                                                     overview_items.get("Founded",None)]
+
+    return [job_id,job_name, job_location,job_age, job_posting_description,\
+            job_salary_range, job_salary_estimate_type, company,\
+            company_total_rating, proportion_reviewers_recommend_company, \
+            company_individual_ratings, company_type_size_sector_industry_yearFounded]
+
+def is_throttled(error: httpx.HTTPError) -> bool:
+    #Only timeouts, 429 and 503 lower the shared request rate (see WS_Rate_Limiter.py). E.g. a 404 does not.
+    if isinstance(error,httpx.TimeoutException): return True
+    return isinstance(error,httpx.HTTPStatusError) and error.response.status_code in (429,503)
+
+class GlassdoorHttpClient:
+    def __init__(self,cookies: Optional[list] = None, max_connections: int = 64, timeout: float = 30,\
+                 request_budget: Optional[RequestBudget] = None, metrics: Optional[Metrics] = None):
+        #cookies is a list of cookie dictionaries, like the one returned by GlassdoorDriver.get_cookies()
+        #If a request_budget is given, every fetch (including retries) takes a token from it and reports how it went,
+        #so the number of connections only caps concurrency, and the budget decides the request rate.
+        #If metrics are given, the time of every fetch, the retries, postings and pages are appended to its JSON lines file.
+        jar = httpx.Cookies()
+        for cookie in cookies or []:
+            jar.set(cookie["name"],cookie["value"],domain = cookie.get("domain",""),path = cookie.get("path","/"))
+        self.client = httpx.AsyncClient(cookies = jar, headers = {"user-agent":USER_AGENT}, follow_redirects = True,\
+                                        timeout = timeout,\
+                                        limits = httpx.Limits(max_connections = max_connections,\
+                                                              max_keepalive_connections = max_connections))
+        self.semaphore = asyncio.Semaphore(max_connections)
+        self.request_budget = request_budget
+        self.metrics = metrics or Metrics()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self,*exc_info):
+        await self.client.aclose()
+
+    async def fetch(self,url: str, retries: int = 3, site: str = "page-load") -> Selector:
+        #site is the name of the stage the fetch is recorded under in self.metrics ("page-load" or "job-posting-load")
+        budget = self.request_budget
+        for i in range(retries):
+            if budget is not None: await budget.acquire_async()
+            start = time.perf_counter()
+            try:
+                with self.metrics.stage(site):
+                    async with self.semaphore:
+                        response = await self.client.get(url)
+                    response.raise_for_status()
+            except httpx.HTTPError as e:
+                if budget is not None: budget.record_failure(is_throttled(e))
+                if i != retries - 1:
+                    self.metrics.emit("retry",site = site,attempt = i + 1,error = type(e).__name__)
+                    await asyncio.sleep(budget.backoff_seconds(i) if budget is not None else 2 ** i)
+                    continue
+                else: raise e
+            if budget is not None: budget.record_success(time.perf_counter() - start)
+            return Selector(text = response.text)
+
+    async def scrape_page(self,url: str, listing_selector: Optional[Selector] = None, job_role: Optional[str] = None,\
+                          location: Optional[str] = None):
+        #Scrapes a single listing page. Returns the rows of the page and the total number of pages of the search.
+        #If the listing page was already fetched, its selector can be passed in so it is not downloaded again.
+        #job_role and location are only used to label the metrics.
+        if listing_selector is None:
+            listing_selector = await self.fetch(url)
+        page_number,last_page_number = parse_page_numbers(listing_selector)
+        postings = parse_listing(listing_selector,url)
+        #A job posting that still fails after its retries is left out, instead of throwing away the rest of the page
+        job_posting_selectors = await asyncio.gather(*[self.fetch(job_posting_url,site = "job-posting-load") for \
+                                                       (_,_,job_posting_url) in postings],return_exceptions = True)
+        rows = []
+        for job_posting_selector,(job_id,job_age,_) in zip(job_posting_selectors,postings):
+            if isinstance(job_posting_selector,Exception):
+                self.metrics.log(f"{job_role} ({location}) : Job posting {job_id} of page {page_number} skipped: FAILED "\
+                                 f"({job_posting_selector!r})",job_id = job_id,job_role = job_role,location = location,\
+                                 page_number = page_number,status = "failed",error = repr(job_posting_selector))
+                continue
+            rows.append(parse_job_posting(job_posting_selector,job_age))
+            self.metrics.emit("posting",job_id = job_id,job_role = job_role,location = location,page_number = page_number)
+        return rows,last_page_number
+
+    async def scrape_search(self,search_url: str, job_role: Optional[str] = None, location: Optional[str] = None) -> list:
+        #Scrapes every page of a search. Only the listing of page 1 is needed to know how many pages there are, so all pages
+        #(including the job postings of page 1) are fetched concurrently right after it, instead of waiting for page 1 to finish.
+        first_page_url = search_page_url(search_url,1)
+        first_listing_selector = await self.fetch(first_page_url)
+        _,last_page_number = parse_page_numbers(first_listing_selector)
+        pages = await asyncio.gather(self.scrape_page(first_page_url,first_listing_selector,job_role,location),\
+                                     *[self.scrape_page(search_page_url(search_url,page_number),None,job_role,location) for \
+                                       page_number in range(2,last_page_number + 1)],return_exceptions = True)
+        rows_collected = []
+        for page_number,page in enumerate(pages,1):
+            if isinstance(page,Exception):
+                self.metrics.log(f"{job_role} ({location}) : Page {page_number} of {last_page_number} extracted: FAILED ({page!r})",\
+                                 event = "page",job_role = job_role,location = location,page_number = page_number,\
+                                 last_page_number = last_page_number,status = "failed",error = repr(page))
+                continue
+            self.metrics.log(f"{job_role} ({location}) : Page {page_number} of {last_page_number} extracted: PASSED",event = "page",\
+                             job_role = job_role,location = location,page_number = page_number,last_page_number = last_page_number,\
+                             status = "passed",postings = len(page[0]))
+            rows_collected.extend(page[0])
+        return rows_collected
+
+async def scrape_searches(search_urls: dict, cookies: list, max_connections: int = 64,\
+                          request_budget: Optional[RequestBudget] = None, metrics: Optional[Metrics] = None) -> dict:
+    #search_urls is a dictionary of (job_role, location) -> url of page 1 of the search
+    metrics = metrics or Metrics()
+    async with GlassdoorHttpClient(cookies,max_connections = max_connections,request_budget = request_budget,\
+                                   metrics = metrics) as http_client:
+        results = await asyncio.gather(*[http_client.scrape_search(search_url,job_role,location) for \
+                                         ((job_role,location),search_url) in search_urls.items()],return_exceptions = True)
+    rows_collected = {}
+    for (job_role,location),rows in zip(search_urls.keys(),results):
+        if isinstance(rows,Exception):
+            #Page 1 could not be fetched, so the number of pages of the search is not known
+            metrics.log(f"{job_role} ({location}) : Page 1 extracted: FAILED ({rows!r})",event = "page",job_role = job_role,\
+                        location = location,page_number = 1,status = "failed",error = repr(rows))
+            rows = []
+        rows_collected[(job_role,location)] = rows
+    return rows_collected
+
+def run_http_scrape(job_roles: list, locations: list, max_connections: int = 64, company_cache: Optional[CompanyCache] = None,\
+                    request_budget: Optional[RequestBudget] = None, metrics: Optional[Metrics] = None) -> dict:
+    #Uses one chrome to login and find the url of every search, then scrapes all of them over http.
+    #Returns a dictionary of (job_role, location) -> list of rows, in page order (Same as run_scrape_pool).
+    #The company fields come with the html of every posting anyway, so the company_cache is only filled, not read.
+    #If metrics are given, the chrome stages and every fetch, retry, posting and page are appended to its JSON lines file.
+    metrics = metrics or Metrics()
+    glassdoor_driver = start_glassdoor_driver(metrics = metrics)
+    try:
+        search_urls = {(job_role,location):glassdoor_driver.start_search(job_role,location) for \
+                       job_role in job_roles for location in locations}
+        cookies = glassdoor_driver.get_cookies()
+    finally:
+        glassdoor_driver.quit()
+    rows_collected = asyncio.run(scrape_searches(search_urls,cookies,max_connections,request_budget,metrics))
+    if company_cache is not None:
+        for rows in rows_collected.values():
+            for row in rows:
+                job_posting = dict(zip(DATA_COLUMN_NAMES,row))
+                if job_posting["company"] and company_cache.get(job_posting["company"]) is None:
+                    company_cache.put(job_posting["company"],job_posting)
+    return rows_collected
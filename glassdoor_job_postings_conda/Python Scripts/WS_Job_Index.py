@@ -0,0 +1,63 @@
+"""
+This script contains the JobIndex class, a job_id index shared by every worker, so that a job posting that shows up under several
+searches (E.g. "Data Analyst", "Business Analyst" and "Data Scientist") is only extracted once.
+
+The index is a small sqlite file, so it can be used by many processes at the same time. Before a posting tab is clicked, the worker
+claims the job_id read from the tab. Only the first search to claim a job_id extracts it. Every other search only records that the
+posting also showed up under it. The search roles of each posting are kept in the job_search_roles table.
+
+Claims only hold for one scrape date (job_index_{scrape_date}.db), the same as the checkpoints, so a posting extracted on an earlier
+day is extracted again (E.g. to see if it was reposted) instead of being skipped forever.
+"""
+
+import os
+import sqlite3
+import datetime
+from typing import Optional
+import pandas as pd
+
+class JobIndex:
+    def __init__(self,path: Optional[str] = None, scrape_date: Optional[str] = None):
+        #scrape_date is today by default. To continue a run that was stopped on an earlier day, pass the date it started on.
+        self.path = path or f"{os.getcwd()}/job_index_{scrape_date or datetime.date.today().isoformat()}.db"
+        self._connection = None
+        with self.connection() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS job_postings (job_id TEXT PRIMARY KEY, job_role TEXT, location TEXT, extracted INTEGER DEFAULT 0)")
+            connection.execute("CREATE TABLE IF NOT EXISTS job_search_roles (job_id TEXT, job_role TEXT, location TEXT, PRIMARY KEY (job_id, job_role, location))")
+
+    def __getstate__(self):
+        #sqlite connections cannot be sent to another process. Each process opens its own connection to the same file.
+        return {"path": self.path, "_connection": None}
+
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path,timeout = 60)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+        return self._connection
+
+    def claim(self,job_id: str, job_role: str, location: str) -> bool:
+        #Records that the posting showed up under the search. Returns True if the caller should extract the posting,
+        #which is only the case for the first search that claims it.
+        with self.connection() as connection:
+            connection.execute("INSERT OR IGNORE INTO job_search_roles VALUES (?,?,?)",(job_id,job_role,location))
+            cursor = connection.execute("INSERT OR IGNORE INTO job_postings (job_id, job_role, location) VALUES (?,?,?)",\
+                                        (job_id,job_role,location))
+            return cursor.rowcount == 1
+
+    def mark_extracted(self,job_id: str):
+        with self.connection() as connection:
+            connection.execute("UPDATE job_postings SET extracted = 1 WHERE job_id = ?",(job_id,))
+
+    def release(self,job_id: str):
+        #Gives up a claim when the extraction failed, so that the posting can be claimed again
+        with self.connection() as connection:
+            connection.execute("DELETE FROM job_postings WHERE job_id = ? AND extracted = 0",(job_id,))
+
+    def release_unfinished_claims(self):
+        #Claims that were never extracted (E.g. the process was killed). Call this before starting the workers of a run.
+        with self.connection() as connection:
+            connection.execute("DELETE FROM job_postings WHERE extracted = 0")
+
+    def search_roles(self) -> pd.DataFrame:
+        #Every (job_id, job_role, location) a posting showed up under
+        return pd.read_sql_query("SELECT * FROM job_search_roles ORDER BY job_id",self.connection())
@@ -0,0 +1,128 @@
+"""
+This script contains the Metrics class, which records what a scrape is doing as JSON lines, so that a long run can be watched
+(and the slow stage found) while it is still going, instead of reading print statements coming from every worker at once.
+
+Every line is one event, with the time, the process id and the type of event:
+
+# 1. stage: How long a stage took (startup, login, go-to-jobs, search, page-load, tab-click, field-extraction, and
+#    job-posting-load with the http engine) and if it failed
+# 2. wait: How long an explicit wait blocked, at which site, and if it timed out (the same as WaitProfile)
+# 3. retry: An attempt that failed and is about to be retried, at which site
+# 4. posting: A job posting was extracted
+# 5. page: A page of a search passed or failed
+# 6. log: Any other message (the messages are also printed, like before)
+
+Every process appends to the same file, one write call per line, so the events of all workers end up in one place.
+Running this script prints a summary of the file (per stage, per wait site, postings/sec), every N seconds with --follow N:
+
+python WS_Metrics.py metrics.jsonl --follow 30
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import contextlib
+from typing import Optional
+import numpy as np
+import pandas as pd
+
+class Metrics:
+    def __init__(self,path: Optional[str] = None, echo: bool = True):
+        #If path is None, nothing is written, and log messages are only printed. If echo is False, they are not printed.
+        self.path = path
+        self.echo = echo
+        self._fd = None
+
+    def __getstate__(self):
+        #File descriptors are not sent to other processes. Each process opens the file for itself.
+        return {"path": self.path, "echo": self.echo, "_fd": None}
+
+    def emit(self,event: str, **fields):
+        if self.path is None: return
+        if self._fd is None:
+            self._fd = os.open(self.path,os.O_WRONLY | os.O_APPEND | os.O_CREAT)
+        line = json.dumps({"time": round(time.time(),3), "pid": os.getpid(), "event": event, **fields},default = str) + "\n"
+        os.write(self._fd,line.encode())
+
+    @contextlib.contextmanager
+    def stage(self,name: str, **fields):
+        #with metrics.stage("login"): ... records how long the block took, and if it raised
+        start = time.perf_counter()
+        failed = True
+        try:
+            yield
+            failed = False
+        finally:
+            self.emit("stage",stage = name,seconds = round(time.perf_counter() - start,4),failed = failed,**fields)
+
+    def log(self,message: str, event: str = "log", **fields):
+        if self.echo: print(f"{message}\n")
+        self.emit(event,message = message,**fields)
+
+def load_events(path: str) -> pd.DataFrame:
+    records = []
+    with open(path) as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError: #Last line can be cut short while it is being written
+                continue
+    return pd.DataFrame(records)
+
+def summarize(events: pd.DataFrame, window_seconds: float = 60) -> dict:
+    #Returns the tables printed by print_summary. Missing columns (E.g. no retry yet) give empty tables.
+    def of_type(event: str) -> pd.DataFrame:
+        return events[events["event"] == event] if "event" in events else pd.DataFrame()
+    percentile = lambda q: (lambda x: np.percentile(x,q))
+
+    #failed/timed_out are missing (NaN) on the other types of events, so they are read as objects and have to be cast back
+    stages = of_type("stage")
+    if len(stages): stages = stages.assign(failed = stages["failed"].astype(bool))
+    stages = stages.groupby("stage").agg(count = ("seconds","size"), failed = ("failed","sum"), total_seconds = ("seconds","sum"),\
+                                         mean_seconds = ("seconds","mean"), p50_seconds = ("seconds",percentile(50)),\
+                                         p95_seconds = ("seconds",percentile(95)), max_seconds = ("seconds","max"))\
+                                    .sort_values("total_seconds",ascending = False) if len(stages) else stages
+
+    waits = of_type("wait")
+    if len(waits): waits = waits.assign(timed_out = waits["timed_out"].astype(bool))
+    waits = waits.groupby("site").agg(waits = ("seconds","size"), timeouts = ("timed_out","sum"), total_seconds = ("seconds","sum"),\
+                                      p95_seconds = ("seconds",percentile(95))) if len(waits) else \
+            pd.DataFrame(columns = ["waits","timeouts","total_seconds","p95_seconds"],index = pd.Index([],name = "site"),dtype = float)
+    retries = of_type("retry")
+    if len(retries):
+        waits = waits.join(retries.groupby("site").size().rename("retries"),how = "outer").fillna(0)
+    if len(waits):
+        waits = waits.sort_values("total_seconds",ascending = False)
+
+    postings, pages = of_type("posting"), of_type("page")
+    now = events["time"].max() if len(events) else time.time()
+    elapsed = now - events["time"].min() if len(events) else 0
+    progress = {"workers": events["pid"].nunique() if len(events) else 0,
+                "elapsed_minutes": round(elapsed/60,1),
+                "postings": len(postings),
+                "postings_per_second": round(len(postings)/elapsed,3) if elapsed else 0,
+                f"postings_per_second_last_{window_seconds:.0f}s": round((postings["time"] > now - window_seconds).sum()/\
+                                                                           min(window_seconds,elapsed),3) if elapsed else 0,
+                "pages_passed": int((pages["status"] == "passed").sum()) if len(pages) else 0,
+                "pages_failed": int((pages["status"] == "failed").sum()) if len(pages) else 0}
+    return {"progress": progress, "stages": stages, "waits": waits}
+
+def print_summary(summary: dict):
+    print(", ".join(f"{name}: {value}" for (name,value) in summary["progress"].items()))
+    for name in ["stages","waits"]:
+        if len(summary[name]):
+            print(f"\n{summary[name].round(3).to_string()}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = "Summary of the metrics of a scrape")
+    parser.add_argument("path",nargs = "?",default = f"{os.getcwd()}/metrics.jsonl")
+    parser.add_argument("--follow",type = float,default = None,help = "Print the summary again every this many seconds")
+    parser.add_argument("--window",type = float,default = 60,help = "Seconds used for the recent postings/sec")
+    settings = parser.parse_args(sys.argv[1:])
+    while True:
+        print_summary(summarize(load_events(settings.path),settings.window))
+        if settings.follow is None: break
+        time.sleep(settings.follow)
+        print("\n" + "-"*80 + "\n")
@@ -0,0 +1,143 @@
+"""
+This script writes the rows collected by GlassdoorDriver into a parquet dataset, instead of a csv where the list columns are saved as
+python list reprs that have to be parsed back during cleaning.
+
+The dataset is partitioned by job_role, location and scrape_date (E.g. extracted_data_parquet/job_role=Data Analyst/location=Singapore/
+scrape_date=2023-08-01/part-....parquet) and has a typed schema:
+
+# 1. company_total_rating is a float, and proportion_reviewers_recommend_company is an integer (E.g. "57 %" -> 57)
+# 2. job_salary_min and job_salary_max are the bounds of job_salary_range in numbers (E.g. "SGD 50K - SGD 55K" -> 50000, 55000)
+# 3. company_individual_ratings is a struct with one float per category
+# 4. company_overview is a struct with the type, size, sector, industry and year founded (an integer) of the company
+
+Reading it back only needs pd.read_parquet("extracted_data_parquet", columns = [...]), which only reads the columns asked for.
+ParquetAppendWriter writes the rows while the scrape is still running, each page as its own file of its partition (page-00003-0.parquet).
+A page that is written again (E.g. by a resumed run) replaces its file, so rows are never saved twice.
+"""
+
+import os
+import re
+import ast
+import datetime
+from typing import Optional
+import pyarrow as pa
+import pyarrow.parquet as pq
+from WS_Glassdoor_Driver import DATA_COLUMN_NAMES
+
+INDIVIDUAL_RATING_FIELDS = {"Career Opportunities": "career_opportunities",
+                            "Comp & Benefits": "comp_and_benefits",
+                            "Culture & Values": "culture_and_values",
+                            "Senior Management": "senior_management",
+                            "Work/Life Balance": "work_life_balance"}
+COMPANY_OVERVIEW_FIELDS = ["type","size","sector","industry","year_founded"]
+
+SCHEMA = pa.schema([("job_id", pa.string()),
+                    ("job_name", pa.string()),
+                    ("job_location", pa.string()),
+                    ("job_age", pa.string()),
+                    ("job_posting_description", pa.string()),
+                    ("job_salary_range", pa.string()),
+                    ("job_salary_min", pa.float64()),
+                    ("job_salary_max", pa.float64()),
+                    ("job_salary_estimate_type", pa.string()),
+                    ("company", pa.string()),
+                    ("company_total_rating", pa.float64()),
+                    ("proportion_reviewers_recommend_company", pa.int32()),
+                    ("company_individual_ratings", pa.struct([(field, pa.float64()) for field in INDIVIDUAL_RATING_FIELDS.values()])),
+                    ("company_overview", pa.struct([("type", pa.string()), ("size", pa.string()), ("sector", pa.string()),\
+                                                    ("industry", pa.string()), ("year_founded", pa.int32())])),
+                    ("job_role", pa.string()),
+                    ("location", pa.string()),
+                    ("scrape_date", pa.string())])
+PARTITION_COLUMN_NAMES = ["job_role","location","scrape_date"]
+
+def to_list(value) -> Optional[list]:
+    #Rows read back from an old csv have the lists saved as strings
+    if isinstance(value,str): return ast.literal_eval(value)
+    return value
+
+def to_float(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError,ValueError):
+        return None
+
+def to_int(value) -> Optional[int]:
+    #Takes the first number in the string. E.g. "57 %" -> 57, "2017" -> 2017, "Unknown" -> None
+    match = re.search(r"\d+",str(value)) if value is not None else None
+    return int(match.group()) if match else None
+
+def salary_bounds(salary_range: Optional[str]):
+    #E.g. "SGD 50K - SGD 55K (Employer est.)" -> (50000.0, 55000.0), "SGD 7K (Employer est.)" -> (7000.0, 7000.0)
+    if not salary_range: return None,None
+    multipliers = {"K": 1000, "M": 1000000, "": 1}
+    amounts = [float(number.replace(",",""))*multipliers[unit] for (number,unit) in \
+               re.findall(r"(\d[\d,]*(?:\.\d+)?)\s*([KM]?)",salary_range.split("(")[0])]
+    if not amounts: return None,None
+    return amounts[0],amounts[-1]
+
+def individual_ratings(company_individual_ratings) -> Optional[dict]:
+    #E.g. ['Career Opportunities', '3.0', '', '', 'Culture & Values', '3.1'] -> {"career_opportunities": 3.0, "comp_and_benefits": None, ...}
+    company_individual_ratings = to_list(company_individual_ratings)
+    if not company_individual_ratings: return None
+    ratings = {field: None for field in INDIVIDUAL_RATING_FIELDS.values()}
+    for category,score in zip(company_individual_ratings,company_individual_ratings[1:]):
+        if category in INDIVIDUAL_RATING_FIELDS:
+            ratings[INDIVIDUAL_RATING_FIELDS[category]] = to_float(score)
+    return ratings
+
+def company_overview(company_type_size_sector_industry_yearFounded) -> Optional[dict]:
+    values = to_list(company_type_size_sector_industry_yearFounded)
+    if not values or all(value is None for value in values): return None
+    overview = dict(zip(COMPANY_OVERVIEW_FIELDS,values))
+    overview["year_founded"] = to_int(overview["year_founded"])
+    return overview
+
+def rows_to_table(rows: list, job_role: str, location: str, scrape_date: Optional[str] = None) -> pa.Table:
+    #Converts rows of GlassdoorDriver.data into a table with the typed SCHEMA
+    scrape_date = scrape_date or datetime.date.today().isoformat()
+    records = []
+    for row in rows:
+        job_posting = dict(zip(DATA_COLUMN_NAMES,row))
+        job_salary_min,job_salary_max = salary_bounds(job_posting["job_salary_range"])
+        records.append({"job_id": job_posting["job_id"],
+                        "job_name": job_posting["job_name"],
+                        "job_location": job_posting["job_location"],
+                        "job_age": job_posting["job_age"],
+                        "job_posting_description": job_posting["job_posting_description"],
+                        "job_salary_range": job_posting["job_salary_range"],
+                        "job_salary_min": job_salary_min,
+                        "job_salary_max": job_salary_max,
+                        "job_salary_estimate_type": job_posting["job_salary_estimate_type"],
+                        "company": job_posting["company"],
+                        "company_total_rating": to_float(job_posting["company_total_rating"]),
+                        "proportion_reviewers_recommend_company": to_int(job_posting["proportion_reviewers_recommend_company"]),
+                        "company_individual_ratings": individual_ratings(job_posting["company_individual_ratings"]),
+                        "company_overview": company_overview(job_posting["company_type_size_sector_industry_yearFounded"]),
+                        "job_role": job_role,
+                        "location": location,
+                        "scrape_date": scrape_date})
+    return pa.Table.from_pylist(records,schema = SCHEMA)
+
+def write_parquet(rows: list, job_role: str, location: str, root_path: Optional[str] = None, scrape_date: Optional[str] = None,\
+                  page_number: Optional[int] = None):
+    #Without a page_number, the rows are all the rows of a search and replace its partition of the dataset.
+    #With a page_number, the rows are written into the file of the page, replacing the one written before, if any.
+    root_path = root_path or f"{os.getcwd()}/extracted_data_parquet"
+    if page_number is None:
+        pq.write_to_dataset(rows_to_table(rows,job_role,location,scrape_date),root_path,partition_cols = PARTITION_COLUMN_NAMES,\
+                            basename_template = "part-{i}.parquet",existing_data_behavior = "delete_matching")
+    else:
+        pq.write_to_dataset(rows_to_table(rows,job_role,location,scrape_date),root_path,partition_cols = PARTITION_COLUMN_NAMES,\
+                            basename_template = f"page-{page_number:05d}-{{i}}.parquet",existing_data_behavior = "overwrite_or_ignore")
+
+class ParquetAppendWriter:
+    #Writes the rows of every page into the partition of its search as soon as they come back, so that rows are saved while a long
+    #run is still going. Each page has one file, so writing a page again (a resumed run yields its finished pages again) replaces it.
+    def __init__(self,root_path: Optional[str] = None, scrape_date: Optional[str] = None):
+        self.root_path = root_path or f"{os.getcwd()}/extracted_data_parquet"
+        self.scrape_date = scrape_date or datetime.date.today().isoformat()
+
+    def append(self,job_role: str, location: str, page_number: int, rows: list):
+        if rows:
+            write_parquet(rows,job_role,location,self.root_path,self.scrape_date,page_number)
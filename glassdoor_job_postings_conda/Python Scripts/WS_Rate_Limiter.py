@@ -0,0 +1,142 @@
+"""
+This script contains the RequestBudget class, a request budget shared by every worker process, so that all workers together stay
+under a request rate that glassdoor tolerates, instead of each worker retrying on its own.
+
+# 1. Token bucket: Every request (a page load, a click that loads a job posting, an http fetch) takes a token first. Tokens are
+#    refilled at `rate` per second for all workers together, and at most `burst` tokens can be saved up.
+# 2. Adaptive rate: Every success raises the rate a little (up to max_rate). A throttled request (E.g. a 429/503 or a page that
+#    timed out) halves it (down to min_rate), and a success that took longer than slow_seconds lowers it by 10%, but the rate is
+#    lowered at most once every decrease_window_seconds, so a burst of failures from requests sent together only counts once.
+#    When the site starts throttling, everyone slows down together, and the rate creeps back up once requests go through again.
+#    Failures that are not throttling (E.g. an element that went stale) do not change the rate.
+# 3. Circuit breaker: After failure_threshold throttled requests in a row (from any worker), the circuit opens and every worker waits
+#    for pause_seconds. Failures of requests that were already sent are ignored while it is open. After the pause, only one request
+#    (the probe) goes through. If it is throttled, the circuit opens again for twice as long (up to max_pause_seconds),
+#    otherwise the circuit closes.
+
+Retries also take a token, so they do not add load on top of the budget while the site is throttling us.
+The state lives in shared memory (multiprocessing.Array), so pass the RequestBudget to the worker processes when they are created.
+"""
+
+import time
+import random
+import asyncio
+import multiprocessing
+from typing import Optional
+from WS_Metrics import Metrics
+
+#Positions in the shared state
+TOKENS, LAST_REFILL, RATE, FAILURES, OPEN_UNTIL, PAUSE_SECONDS, HALF_OPEN, LAST_DECREASE, PROBE_SENT = range(9)
+
+class RequestBudget:
+    def __init__(self,rate: float = 2, burst: float = 5, min_rate: float = 0.1, max_rate: float = 8, increase: float = 0.05,\
+                 slow_seconds: float = 10, failure_threshold: int = 5, pause_seconds: float = 60, max_pause_seconds: float = 900,\
+                 decrease_window_seconds: float = 10, probe_timeout_seconds: float = 60, metrics: Optional[Metrics] = None):
+        #If the probe sent after a pause has not reported back after probe_timeout_seconds, another request is let through as the probe
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.slow_seconds = slow_seconds
+        self.failure_threshold = failure_threshold
+        self.initial_pause_seconds = pause_seconds
+        self.max_pause_seconds = max_pause_seconds
+        self.decrease_window_seconds = decrease_window_seconds
+        self.probe_timeout_seconds = probe_timeout_seconds
+        self.metrics = metrics or Metrics()
+        self.state = multiprocessing.Array("d",[burst,time.time(),rate,0,0,pause_seconds,0,0,0])
+
+    def refill(self,now: float):
+        #Adds the tokens earned since the last refill. Must be called with the lock held.
+        state = self.state
+        state[TOKENS] = min(self.burst,state[TOKENS] + (now - state[LAST_REFILL])*state[RATE])
+        state[LAST_REFILL] = now
+
+    def reserve(self) -> float:
+        #Takes a token if there is one and the circuit is closed, and returns 0.
+        #Otherwise, returns the number of seconds to wait before trying again.
+        with self.state.get_lock():
+            now = time.time()
+            self.refill(now)
+            if now < self.state[OPEN_UNTIL]:
+                return self.state[OPEN_UNTIL] - now
+            probe = self.state[HALF_OPEN] and now - self.state[PROBE_SENT] >= self.probe_timeout_seconds
+            if self.state[HALF_OPEN] and not probe: #Waiting for the probe to report back
+                return min(1,self.state[PROBE_SENT] + self.probe_timeout_seconds - now)
+            if self.state[TOKENS] >= 1:
+                self.state[TOKENS] -= 1
+                if probe: self.state[PROBE_SENT] = now
+                return 0
+            return (1 - self.state[TOKENS])/self.state[RATE]
+
+    def acquire(self):
+        #Blocks until a token is taken
+        while (seconds := self.reserve()) > 0:
+            time.sleep(seconds)
+
+    async def acquire_async(self):
+        #Same as acquire, without blocking the event loop
+        while (seconds := self.reserve()) > 0:
+            await asyncio.sleep(seconds)
+
+    def close_circuit(self):
+        #Must be called with the lock held
+        state = self.state
+        state[FAILURES] = 0
+        state[HALF_OPEN] = 0
+        state[PROBE_SENT] = 0
+        state[PAUSE_SECONDS] = self.initial_pause_seconds
+
+    def decrease_rate(self,now: float, factor: float):
+        #Lowers the rate, unless it was already lowered in the last decrease_window_seconds. Must be called with the lock held.
+        state = self.state
+        if now - state[LAST_DECREASE] >= self.decrease_window_seconds:
+            state[RATE] = max(self.min_rate,state[RATE]*factor)
+            state[LAST_DECREASE] = now
+
+    def record_success(self,seconds: float):
+        #seconds is how long the request took
+        with self.state.get_lock():
+            now = time.time()
+            self.refill(now)
+            self.close_circuit()
+            if seconds > self.slow_seconds:
+                self.decrease_rate(now,0.9)
+            else:
+                self.state[RATE] = min(self.max_rate,self.state[RATE] + self.increase)
+
+    def record_failure(self,throttled: bool = True):
+        #throttled is False for failures that are not a sign of throttling (E.g. an element that went stale). They do not change
+        #the rate, but the site did answer, so if the request was the probe sent after a pause, the circuit closes.
+        with self.state.get_lock():
+            now = time.time()
+            self.refill(now)
+            state = self.state
+            if not throttled:
+                if state[HALF_OPEN] and state[PROBE_SENT]: self.close_circuit()
+                return
+            #Requests sent before the circuit opened, that failed while it was open or before the probe was sent
+            if now < state[OPEN_UNTIL] or (state[HALF_OPEN] and not state[PROBE_SENT]): return
+            self.decrease_rate(now,0.5)
+            state[FAILURES] += 1
+            if state[HALF_OPEN] or state[FAILURES] >= self.failure_threshold:
+                if state[HALF_OPEN]:
+                    state[PAUSE_SECONDS] = min(self.max_pause_seconds,state[PAUSE_SECONDS]*2)
+                state[OPEN_UNTIL] = now + state[PAUSE_SECONDS]
+                state[FAILURES] = 0
+                state[HALF_OPEN] = 1 #The first request after the pause (the probe) decides if the circuit closes again
+                state[PROBE_SENT] = 0
+                state[TOKENS] = 0
+                self.metrics.log(f"Too many failed requests, pausing all workers for {state[PAUSE_SECONDS]:.0f} seconds",\
+                                 event = "circuit-open",pause_seconds = state[PAUSE_SECONDS],rate = state[RATE])
+
+    def backoff_seconds(self,attempt: int) -> float:
+        #Time to wait before retry number attempt + 1. Grows with the number of attempts and as the shared rate goes down,
+        #with jitter so that workers that failed together do not retry together.
+        return min(60,(2 ** attempt)*(self.max_rate/self.rate())**0.5*random.uniform(0.5,1.5))
+
+    def rate(self) -> float:
+        return self.state[RATE]
+
+    def is_open(self) -> bool:
+        return time.time() < self.state[OPEN_UNTIL]
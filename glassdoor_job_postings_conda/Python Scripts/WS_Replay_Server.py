@@ -0,0 +1,266 @@
+"""
+This script contains ReplayServer, a local stand-in for glassdoor that serves the job postings saved in "Scrapped Data", so that the
+scrapers can be run and timed without any network (see Benchmark_Scraper.py).
+
+The pages use the same element ids and class names that GlassdoorDriver and WS_Glassdoor_Http.py look for:
+
+# 1. Home page: SignInButton, modalUserEmail and modalUserPassword. Pressing enter in the password goes to the logged in page.
+# 2. Every logged in page: ContentNav (site-header-jobs) and app-navigation (jobs-search-results-page-link).
+# 3. Search page: searchBar-jobTitle and searchBar-location. Pressing enter in the job title shows the listing of the search.
+# 4. Listing pages: filter_jobType and its fulltime button, the posting tabs (#MainCol .react-job-listing with data-id and
+#    .listing-age), paginationFooter ("Page 1 of 5"), nextButton, and the job posting of the selected tab in #JDCol.
+#    Clicking a tab loads its job posting into #JDCol with a fetch, like glassdoor does.
+# 5. Job posting pages (/job-listing/?jl={job_id}): #JDCol article with job-title-{id}, job-location-{id}, job-employer-{id},
+#    JobDesc{id}, job-salary-{id}, employerStats, the individual ratings and EmpBasicInfo.
+
+Searches use the rows of {job_role}_extracted_data.csv (or every row, for a job role without a csv). Every listing page and job
+posting can be delayed (latency_seconds, plus up to jitter_seconds) and can fail with a 503 (failure_rate), to see how the scrapers
+behave when the site is slow or throttling.
+
+Running this script starts the server on the port given (8000 by default) until it is stopped with ctrl+c.
+"""
+
+import os
+import re
+import ast
+import sys
+import glob
+import html
+import time
+import random
+import threading
+from typing import Optional
+from urllib.parse import urlparse, parse_qs, quote
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pandas as pd
+from WS_Glassdoor_Driver import DATA_COLUMN_NAMES
+
+OVERVIEW_LABELS = ["Type","Size","Sector","Industry","Founded"] #Same order as company_type_size_sector_industry_yearFounded
+
+def load_recorded_postings(directory: str) -> dict:
+    #Returns a dictionary of job role -> list of rows (DATA_COLUMN_NAMES) from every *_extracted_data.csv in the directory
+    postings = {}
+    for file_name in sorted(glob.glob(f"{directory}/*_extracted_data.csv")):
+        job_role = os.path.basename(file_name)[:-len("_extracted_data.csv")].replace("_"," ")
+        df = pd.read_csv(file_name,dtype = str).drop(columns = ["Unnamed: 0"],errors = "ignore")
+        df = df.astype(object).where(df.notna(),None)
+        for column_name in ["company_individual_ratings","company_type_size_sector_industry_yearFounded"]:
+            if column_name in df.columns:
+                df[column_name] = df[column_name].map(lambda value: ast.literal_eval(value) if isinstance(value,str) else value)
+        postings[job_role.lower()] = [[row.get(column_name) for column_name in DATA_COLUMN_NAMES] for row in df.to_dict("records")]
+    return postings
+
+def slug(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+","-",text.lower()).strip("-")
+
+def element(tag: str, text: Optional[str], **attributes) -> str:
+    #E.g. element("div","Telstra",id = "job-employer-1") -> '<div id="job-employer-1">Telstra</div>'. No element if text is None.
+    if text is None: return ""
+    attributes = "".join(f' {name.rstrip("_").replace("_","-")}="{html.escape(str(value))}"' for (name,value) in attributes.items())
+    return f"<{tag}{attributes}>{text}</{tag}>"
+
+def render_article(row: list) -> str:
+    #The job posting shown on the right side of a listing page
+    job_posting = dict(zip(DATA_COLUMN_NAMES,row))
+    job_id = job_posting["job_id"]
+    escape = lambda value: html.escape(str(value)) if value is not None else None
+
+    salary = None
+    if job_posting["job_salary_range"] is not None:
+        salary_estimate_type = job_posting["job_salary_estimate_type"]
+        salary_range = job_posting["job_salary_range"]
+        if salary_estimate_type and salary_range.endswith(salary_estimate_type):
+            salary_range = salary_range[:-len(salary_estimate_type)].rstrip()
+        salary = escape(salary_range) + " " + element("span",escape(salary_estimate_type),class_ = "salary-estimate-type")
+
+    description = "".join(element("p",escape(line)) for line in (job_posting["job_posting_description"] or "").split("\n") if line.strip())
+    employer_stats = element("div",escape(job_posting["company_total_rating"]),class_ = "e1pr2f4f1",data_test = "rating-info") + \
+                     (element("svg",element("text",escape(job_posting["proportion_reviewers_recommend_company"])),class_ = "css-ztsow4") \
+                      if job_posting["proportion_reviewers_recommend_company"] is not None else "")
+    individual_ratings = job_posting["company_individual_ratings"]
+    individual_ratings = element("div","".join(element("div",escape(rating),class_ = "erz4gkm1") for rating in individual_ratings),\
+                                 class_ = "erz4gkm0") if individual_ratings is not None else ""
+    overview = job_posting["company_type_size_sector_industry_yearFounded"] or []
+    basic_info = "".join(element("div",element("span",label) + element("span",escape(value)),class_ = "e1pvx6aw0") for \
+                         (label,value) in zip(OVERVIEW_LABELS,overview) if value is not None)
+
+    return element("article",
+                   element("div",escape(job_posting["company"]),id = f"job-employer-{job_id}") +
+                   element("div",escape(job_posting["job_name"]),id = f"job-title-{job_id}") +
+                   element("div",escape(job_posting["job_location"]),id = f"job-location-{job_id}") +
+                   element("div",salary,id = f"job-salary-{job_id}") +
+                   element("div",element("div",description,class_ = "jobDescriptionContent"),id = f"JobDesc{job_id}") +
+                   element("div",employer_stats,id = "employerStats") + individual_ratings +
+                   element("div",basic_info,id = "EmpBasicInfo"),
+                   data_id = job_id)
+
+HEADER = """<div id="ContentNav"><ul><li data-test="site-header-jobs"><a href="/Job/index.htm">Jobs</a></li></ul></div>
+<div id="app-navigation"><a data-test="jobs-search-results-page-link" href="/Job/search.htm">Search jobs</a></div>"""
+
+SEARCH_BARS = """<input id="searchBar-jobTitle" value="{job_role}"><input id="searchBar-location" value="{location}">
+<script>
+document.getElementById("searchBar-jobTitle").addEventListener("keydown", (event) => {{
+    if (event.key !== "Enter") return;
+    const slug = (text) => text.toLowerCase().replace(/[^a-z0-9]+/g, "-").replace(/^-+|-+$/g, "");
+    const jobRole = document.getElementById("searchBar-jobTitle").value;
+    const location = document.getElementById("searchBar-location").value;
+    window.location.href = "/Job/" + slug(jobRole) + "-jobs-SRCH_KO0," + jobRole.length + ".htm?location=" + encodeURIComponent(location);
+}});
+</script>"""
+
+LISTING_SCRIPT = """<script>
+for (const tab of document.querySelectorAll("#MainCol .react-job-listing")) {
+    tab.addEventListener("click", async (event) => {
+        event.preventDefault();
+        for (const selected of document.querySelectorAll("#MainCol .selected")) selected.classList.remove("selected");
+        tab.classList.add("selected");
+        const response = await fetch("/job-listing/?fragment=1&jl=" + tab.getAttribute("data-id"));
+        if (response.ok) document.getElementById("JDCol").innerHTML = await response.text();
+    });
+}
+</script>"""
+
+def page(title: str, body: str) -> str:
+    return f"<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>{title}</title></head><body>{body}</body></html>"
+
+class ReplayServer:
+    def __init__(self,postings: Optional[dict] = None, postings_per_search: Optional[int] = None, postings_per_page: int = 30,\
+                 latency_seconds: float = 0, jitter_seconds: float = 0, failure_rate: float = 0, port: int = 0, seed: int = 0):
+        #postings is a dictionary of job role -> rows (By default, everything in "Scrapped Data").
+        #If postings_per_search is given, the rows of every search are cut or repeated (with new job_ids) to that number.
+        self.postings = postings if postings is not None else \
+                        load_recorded_postings(f"{os.path.dirname(os.path.abspath(__file__))}/../Scrapped Data")
+        self.postings_per_search = postings_per_search
+        self.postings_per_page = postings_per_page
+        self.latency_seconds = latency_seconds
+        self.jitter_seconds = jitter_seconds
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {"listing": 0, "job_posting": 0, "failed": 0}
+        self.rows_by_job_id = {}
+        self.searches = {} #job role slug -> rows, built on the first request
+        server = self
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.handle(self)
+            def log_message(self,*args):
+                pass
+        self.http_server = ThreadingHTTPServer(("127.0.0.1",port),Handler)
+        self.http_server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.http_server.server_address[1]}/"
+
+    def search_url(self,job_role: str, location: str) -> str:
+        #Url of page 1 of a search, the same one the search bar goes to
+        return f"{self.url}Job/{slug(job_role)}-jobs-SRCH_KO0,{len(job_role)}.htm?location={quote(location)}"
+
+    def start(self) -> "ReplayServer":
+        self.thread = threading.Thread(target = self.http_server.serve_forever,daemon = True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.http_server.shutdown()
+        self.http_server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self,*exc_info):
+        self.stop()
+
+    def search_rows(self,job_role_slug: str) -> list:
+        with self.lock:
+            if job_role_slug not in self.searches:
+                rows = {slug(job_role):rows for (job_role,rows) in self.postings.items()}.get(job_role_slug) or \
+                       [row for rows in self.postings.values() for row in rows]
+                if self.postings_per_search is not None:
+                    rows = [row if i < len(rows) else [f"{row[0]}{i//len(rows)}"] + row[1:] for \
+                            (i,row) in ((i,rows[i % len(rows)]) for i in range(self.postings_per_search))]
+                self.searches[job_role_slug] = rows
+                self.rows_by_job_id.update((row[0],row) for row in rows)
+            return self.searches[job_role_slug]
+
+    def delay_or_fail(self,kind: str) -> bool:
+        #Applies the latency of a listing page or job posting. Returns True if the request should fail.
+        with self.lock:
+            self.counts[kind] += 1
+            seconds = self.latency_seconds + self.random.uniform(0,self.jitter_seconds)
+            failed = self.random.random() < self.failure_rate
+            if failed: self.counts["failed"] += 1
+        if seconds: time.sleep(seconds)
+        return failed
+
+    def handle(self,request: BaseHTTPRequestHandler):
+        parsed_url = urlparse(request.path)
+        query = {name:values[0] for (name,values) in parse_qs(parsed_url.query).items()}
+        path = parsed_url.path
+        search = re.match(r"^/Job/(?P<job_role>.+)-jobs-SRCH_KO0,\d+(?:_IP(?P<page_number>\d+))?\.htm$",path)
+        if path in ("/",""):
+            body = page("Glassdoor","""<button id="SignInButton" onclick="document.getElementById('modal').style.display = 'block'">Sign In</button>
+<div id="modal" style="display: none"><input id="modalUserEmail"><input id="modalUserPassword" type="password"></div>
+<script>
+document.getElementById("modalUserPassword").addEventListener("keydown", (event) => {
+    if (event.key === "Enter") window.location.href = "/member/home.htm";
+});
+</script>""")
+        elif path == "/member/home.htm" or path == "/Job/index.htm":
+            body = page("Glassdoor",HEADER)
+        elif path == "/Job/search.htm":
+            body = page("Glassdoor",HEADER + SEARCH_BARS.format(job_role = "",location = ""))
+        elif search:
+            if self.delay_or_fail("listing"): return self.respond(request,503,page("Error","Too many requests"))
+            body = self.listing_page(search.group("job_role"),int(search.group("page_number") or 1),query)
+        elif path.rstrip("/") == "/job-listing":
+            if self.delay_or_fail("job_posting"): return self.respond(request,503,page("Error","Too many requests"))
+            row = self.rows_by_job_id.get(query.get("jl"))
+            if row is None: return self.respond(request,404,page("Not found","Job posting not found"))
+            article = render_article(row)
+            body = article if query.get("fragment") else page(row[1] or "",HEADER + element("div",article,id = "JDCol"))
+        else:
+            return self.respond(request,404,page("Not found","Page not found"))
+        self.respond(request,200,body)
+
+    def respond(self,request: BaseHTTPRequestHandler, status: int, body: str):
+        content = body.encode()
+        request.send_response(status)
+        request.send_header("Content-Type","text/html; charset=utf-8")
+        request.send_header("Content-Length",str(len(content)))
+        request.end_headers()
+        request.wfile.write(content)
+
+    def listing_page(self,job_role_slug: str, page_number: int, query: dict) -> str:
+        rows = self.search_rows(job_role_slug)
+        last_page_number = max(1,-(-len(rows)//self.postings_per_page))
+        page_number = min(page_number,last_page_number)
+        page_rows = rows[(page_number - 1)*self.postings_per_page:page_number*self.postings_per_page]
+        location = query.get("location","")
+        job_role = job_role_slug.replace("-"," ").title()
+        suffix = f"?location={quote(location)}" + ("&jobType=fulltime" if query.get("jobType") else "")
+        base_path = f"/Job/{job_role_slug}-jobs-SRCH_KO0,{len(job_role)}"
+
+        tabs = "".join(element("li",element("a",html.escape(row[1] or ""),href = f"/job-listing/?jl={row[0]}") + \
+                                    element("div",html.escape(row[3] or ""),class_ = "listing-age"),\
+                               class_ = "react-job-listing selected" if i == 0 else "react-job-listing",data_id = row[0]) for \
+                       (i,row) in enumerate(page_rows))
+        next_button = f'<button class="nextButton" onclick="window.location.href = \'{base_path}_IP{page_number + 1}.htm{suffix}\'">Next</button>' \
+                      if page_number < last_page_number else '<button class="nextButton" disabled>Next</button>'
+        filters = f"""<button id="filter_jobType" onclick="document.getElementById('jobTypeMenu').style.display = 'block'">Job type</button>
+<div id="jobTypeMenu" style="display: none"><button value="fulltime" onclick="window.location.href = '{base_path}.htm?location={quote(location)}&jobType=fulltime'">Full-time</button></div>"""
+        return page(f"{job_role} jobs",HEADER + SEARCH_BARS.format(job_role = html.escape(job_role),location = html.escape(location)) +\
+                    filters + element("div",element("ul",tabs) + element("div",f"Page {page_number} of {last_page_number}",class_ = "paginationFooter") +\
+                                      next_button,id = "MainCol") + \
+                    element("div",render_article(page_rows[0]) if page_rows else "",id = "JDCol") + LISTING_SCRIPT)
+
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8000
+    with ReplayServer(port = port) as replay_server:
+        print(f"Serving recorded job postings on {replay_server.url}")
+        try:
+            while True: time.sleep(1)
+        except KeyboardInterrupt:
+            pass
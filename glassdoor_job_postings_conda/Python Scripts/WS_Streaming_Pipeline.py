@@ -0,0 +1,93 @@
+"""
+This script connects the scraper straight to the cleaning steps of Cleaning_Glassdoor_Data.py, instead of scraping everything into csvs
+first and then concatenating all of them in the notebook to clean them.
+
+The pages of job postings are consumed one at a time as the scraper produces them (from the worker pool with iter_scrape_pool, or
+from a single GlassdoorDriver with iter_job_role). Rows are buffered until there are batch_size of them, then the batch is cleaned and
+written into the final store (a sink). Only one batch is held in memory at any time, plus the job_ids seen so far (to drop postings
+that were already written), so memory stays flat no matter how many job roles and locations are scraped, and cleaned data is
+available while the scrape is still running.
+
+A sink is any object with write(df) and close() methods. CsvSink and ParquetSink are included.
+"""
+
+import os
+import pandas as pd
+from WS_Glassdoor_Driver import DATA_COLUMN_NAMES, start_glassdoor_driver
+from Cleaning_Glassdoor_Data import clean_dataframe
+
+class CsvSink:
+    #Appends every cleaned batch to the same csv
+    def __init__(self,path: str = None):
+        self.path = path or f"{os.getcwd()}/cleaned_glassdoor_data.csv"
+        self.header_written = False
+
+    def write(self,df: pd.DataFrame):
+        df.to_csv(self.path,mode = "a" if self.header_written else "w",header = not self.header_written,index = False)
+        self.header_written = True
+
+    def close(self):
+        pass
+
+class ParquetSink:
+    #Writes every cleaned batch as a new file of the same parquet dataset (read it back with pd.read_parquet(directory))
+    def __init__(self,directory: str = None):
+        self.directory = directory or f"{os.getcwd()}/cleaned_glassdoor_data_parquet"
+        os.makedirs(self.directory,exist_ok = True)
+        self.number_of_files = len(os.listdir(self.directory))
+
+    def write(self,df: pd.DataFrame):
+        df.to_parquet(f"{self.directory}/part-{self.number_of_files:05d}.parquet",index = False)
+        self.number_of_files += 1
+
+    def close(self):
+        pass
+
+def iter_job_role(job_role: str, location: str):
+    #Scrapes one job role with a single driver, yielding (job_role, location, page_number, rows) page by page
+    glassdoor_driver = start_glassdoor_driver()
+    try:
+        for page_number,rows in glassdoor_driver.iter_pages(job_role,location):
+            yield job_role, location, page_number, rows
+    finally:
+        glassdoor_driver.quit()
+
+def clean_batch(rows: list, seen_job_ids: set) -> pd.DataFrame:
+    #Cleans a batch of rows of GlassdoorDriver.data, dropping job postings that were already in an earlier batch
+    df = pd.DataFrame(rows,columns = DATA_COLUMN_NAMES)
+    df = df[~df["job_id"].isin(seen_job_ids)]
+    seen_job_ids.update(df["job_id"])
+    return clean_dataframe(df)
+
+def run_streaming_pipeline(pages, sink, batch_size: int = 1000) -> int:
+    #pages is an iterable of (job_role, location, page_number, rows), like iter_scrape_pool or iter_job_role.
+    #Returns the number of cleaned rows written into the sink.
+    batch, seen_job_ids, number_of_rows_written = [], set(), 0
+
+    def write_batch():
+        nonlocal batch, number_of_rows_written
+        df = clean_batch(batch,seen_job_ids)
+        batch = []
+        if len(df):
+            sink.write(df)
+            number_of_rows_written += len(df)
+
+    try:
+        for job_role, location, page_number, rows in pages:
+            batch.extend(rows)
+            if len(batch) >= batch_size:
+                write_batch()
+        if batch:
+            write_batch()
+    finally:
+        sink.close()
+    return number_of_rows_written
+
+if __name__ == '__main__':
+    from WS_multiprocessing_jobs_locations import iter_scrape_pool
+    import multiprocessing
+    job_roles = ["Data Analyst","Machine Learning Engineer","Data Engineer","Database Administrator",\
+                 "Data Scientist","Data Architect","Software Engineer","Business Analyst","Statistician"]
+    locations = ["Singapore"]
+    number_of_rows = run_streaming_pipeline(iter_scrape_pool(job_roles,locations,multiprocessing.cpu_count()),CsvSink())
+    print(f"Completed scrapping and cleaning of {number_of_rows} job postings")
@@ -1,7 +1,14 @@
 """
-This script uses the WS_Glassdoor_Driver.py file (place that file in the same location as this file). As we have a lot of data to scrape, 
+This script uses the WS_Glassdoor_Driver.py file (place that file in the same location as this file). As we have a lot of data to scrape,
 we need to find a way to increase efficiency. I do that by running the webscrapping in parallel using the multiprocessing library.
 
+Instead of starting one chrome per job role, the script starts a fixed pool of workers. Each worker starts one headless chrome and logs
+in once, then keeps taking units of work (job_role, location, page) from a shared queue until there is nothing left. Page 1 of every
+search is queued first. As soon as page 1 is shown, we know how many pages the search has, and the rest of its pages are queued
+for the other workers while page 1 is still being extracted. The rows of
+every unit are sent back to the parent through a result queue, and the parent writes one csv per job role at the end. This way, any
+number of job roles and locations can be scraped with a fixed number of browsers.
+
 # The job roles that we will be searching data for includes:
 # 1. Data Analyst
 # 2. Machine Learning Engineer
@@ -16,21 +23,311 @@ we need to find a way to increase efficiency. I do that by running the webscrapp
 
 from WS_Glassdoor_Driver import *
 import multiprocessing
+import queue
+import datetime
+
+MAX_ATTEMPTS_PER_UNIT = 3 #A unit that fails is put back into the queue until it has been tried this many times
+
+def scrape_worker(task_queue, result_queue, checkpoint_store = None, job_index = None, company_cache = None, incremental_database = None,\
+                  request_budget = None, metrics = None, stop_event = None):
+    #Takes units of work from task_queue until it receives None, or until stop_event is set. Startup and login is only done once
+    #per worker, unless the driver breaks, in which case it is restarted for the next unit.
+    #When the worker stops, the time spent at each wait site is sent back to the parent.
+    glassdoor_driver = None
+    wait_profile = WaitProfile()
+    while True:
+        task = task_queue.get()
+        if task is None or (stop_event is not None and stop_event.is_set()): break
+        job_role, location, page_number, attempt = task
+        try:
+            if glassdoor_driver is None:
+                glassdoor_driver = start_glassdoor_driver(wait_profile,metrics)
+                glassdoor_driver.checkpoint_store = checkpoint_store
+                glassdoor_driver.job_index = job_index
+                glassdoor_driver.company_cache = company_cache
+                glassdoor_driver.incremental_database = incremental_database
+                glassdoor_driver.request_budget = request_budget
+            #The number of pages is sent back as soon as page 1 is shown, so the rest of the search can be fanned out
+            #to the other workers while this one is still extracting page 1
+            on_last_page_number = (lambda last_page_number: result_queue.put(("pages", task, None, last_page_number))) \
+                                  if page_number == 1 else None
+            glassdoor_driver.data = []
+            rows, last_page_number = glassdoor_driver.scrape_page(job_role,location,page_number,on_last_page_number)
+            result_queue.put(("passed", task, rows, last_page_number))
+        except Exception as e:
+            #Rows extracted before the error are sent back too. The retry of the unit skips them, as they are already extracted.
+            if glassdoor_driver is not None and glassdoor_driver.data:
+                result_queue.put(("rows", task, glassdoor_driver.data, None))
+            result_queue.put(("failed", task, repr(e), None))
+            if glassdoor_driver is not None:
+                try:
+                    glassdoor_driver.get_screenshot_as_file(f"error_{job_role}_page_{page_number}.png")
+                    glassdoor_driver.quit()
+                except Exception:
+                    pass
+                glassdoor_driver = None
+    if glassdoor_driver is not None:
+        glassdoor_driver.quit()
+    result_queue.put(("wait_profile", None, wait_profile.records, None))
+
+def iter_scrape_pool(job_roles: list, locations: list, number_of_workers: int, checkpoint_store: Optional[CheckpointStore] = None,\
+                     job_index: Optional[JobIndex] = None, company_cache: Optional[CompanyCache] = None,\
+                     incremental_database = None, request_budget: Optional[RequestBudget] = None,\
+                     wait_profile: Optional[WaitProfile] = None, metrics: Optional[Metrics] = None):
+    #Scrapes every job role in every location using number_of_workers browsers.
+    #Yields (job_role, location, page_number, rows) for every page as soon as it comes back from a worker, so that the rows
+    #can be used while the run is still going. Pages of a search can come back in any order. The rows of a page include the rows
+    #extracted by attempts of the page that failed halfway, and pages finished by an earlier run are yielded first.
+    #The wait sites of all workers are combined and saved into wait_profile.csv.
+    #If a checkpoint_store is given, workers save rows as they scrape them, and pages finished by an earlier run are not queued again.
+    #If a job_index is given, a job posting that shows up under several searches is only extracted by the first one.
+    #If a company_cache is given, it is shared by all workers, so the profile of each company is only extracted once.
+    #If an incremental_database (WS_Database.GlassdoorDatabase) is given, only postings that are not in it yet are extracted, and once
+    #every page of a search has passed, postings of the search that are gone are marked closed in it.
+    #If a request_budget is given, it is shared by all workers, so that together they stay under its request rate, and all of them
+    #pause when requests keep failing (see WS_Rate_Limiter.py).
+    #If a wait_profile is given, the wait records of all workers are also added to it.
+    #If metrics are given, every worker and the parent append their stage timings, waits, retries and page results to its
+    #JSON lines file, so the run can be followed with WS_Metrics.py while it is going.
+    metrics = metrics or Metrics()
+    task_queue = multiprocessing.Queue()
+    result_queue = multiprocessing.Queue()
+    stop_event = multiprocessing.Event() #Set when the pool stops, so that workers do not start the units still queued
+    outstanding = 0 #Number of units queued that have not come back yet
+    resumed_pages = [] #(job_role, location, page_number) finished by an earlier run
+    fanned_out = set() #Searches whose pages after page 1 have been queued
+
+    def unfinished_pages(job_role, location, pages):
+        if checkpoint_store is None: return list(pages)
+        finished_pages = checkpoint_store.finished_pages(job_role,location)
+        return [page_number for page_number in pages if page_number not in finished_pages]
+
+    for job_role in job_roles:
+        for location in locations:
+            last_page_number = checkpoint_store.load(job_role,location)["last_page_number"] if checkpoint_store else None
+            #Page 1 is queued first to find out the number of pages, unless an earlier run already knows it
+            pages = range(1,last_page_number + 1) if last_page_number else [1]
+            if checkpoint_store is not None:
+                resumed_pages += [(job_role,location,page_number) for page_number in sorted(checkpoint_store.finished_pages(job_role,location))]
+            for page_number in unfinished_pages(job_role,location,pages):
+                task_queue.put((job_role, location, page_number, 0))
+                outstanding += 1
+            #Every page is already queued, so page 1 (if it is not finished) must not fan them out again
+            if last_page_number: fanned_out.add((job_role,location))
+
+    if job_index is not None:
+        job_index.release_unfinished_claims()
+    workers = []
+
+    def start_workers():
+        #Only page 1 of every search is known at the start, so more workers are started (up to number_of_workers) as the pages
+        #of each search are fanned out. Scraping a single big search still uses every worker for its pages after page 1.
+        while len(workers) < min(number_of_workers,outstanding):
+            worker = multiprocessing.Process(target = scrape_worker, args = (task_queue,result_queue,checkpoint_store,job_index,\
+                                                                             company_cache,incremental_database,request_budget,metrics,\
+                                                                             stop_event))
+            worker.start()
+            workers.append(worker)
+
+    start_workers()
+
+    failed_units = []
+    passed_pages = {} #(job_role, location) -> pages that passed in this run
+    partial_rows = {} #(job_role, location, page_number) -> rows extracted by attempts that failed
+
+    def fan_out(job_role, location, last_page_number):
+        nonlocal outstanding
+        if (job_role,location) in fanned_out: return
+        fanned_out.add((job_role,location))
+        for next_page_number in unfinished_pages(job_role,location,range(2,last_page_number + 1)):
+            task_queue.put((job_role, location, next_page_number, 0))
+            outstanding += 1
+        start_workers()
+
+    try:
+        for job_role, location, page_number in resumed_pages:
+            yield job_role, location, page_number, checkpoint_store.page_rows(job_role,location,page_number)
+        while outstanding:
+            try:
+                status, task, payload, last_page_number = result_queue.get(timeout = 60)
+            except queue.Empty:
+                if not any(worker.is_alive() for worker in workers):
+                    metrics.log(f"All workers stopped with {outstanding} units left")
+                    break
+                continue
+            job_role, location, page_number, attempt = task
+            if status == "pages":
+                fan_out(job_role,location,last_page_number)
+                continue
+            if status == "rows":
+                partial_rows.setdefault((job_role,location,page_number),[]).extend(payload)
+                continue
+            outstanding -= 1
+            if status == "passed":
+                if checkpoint_store is not None:
+                    checkpoint_store.finish_page(job_role,location,page_number,last_page_number)
+                    payload = checkpoint_store.page_rows(job_role,location,page_number)
+                else:
+                    payload = list({row[0]:row for row in partial_rows.pop((job_role,location,page_number),[]) + payload}.values())
+                metrics.log(f"{job_role} ({location}) : Page {page_number} of {last_page_number} extracted: PASSED",event = "page",\
+                            job_role = job_role,location = location,page_number = page_number,last_page_number = last_page_number,\
+                            status = "passed",postings = len(payload))
+                if page_number == 1:
+                    fan_out(job_role,location,last_page_number)
+                passed_pages.setdefault((job_role,location),set()).add(page_number)
+                search_finished = checkpoint_store.is_finished(job_role,location) if checkpoint_store is not None else \
+                                  len(passed_pages[(job_role,location)]) == last_page_number
+                if incremental_database is not None and search_finished:
+                    closed = incremental_database.close_missing_postings(job_role,location)
+                    metrics.log(f"{job_role} ({location}) : {closed} job postings closed")
+                yield job_role, location, page_number, payload
+            else:
+                metrics.log(f"{job_role} ({location}) : Page {page_number} extracted: FAILED ({payload})",event = "page",\
+                            job_role = job_role,location = location,page_number = page_number,status = "failed",attempt = attempt,\
+                            error = payload)
+                if attempt + 1 < MAX_ATTEMPTS_PER_UNIT:
+                    task_queue.put((job_role, location, page_number, attempt + 1))
+                    outstanding += 1
+                else:
+                    failed_units.append(task)
+                    #The rows extracted before the page failed for good are still kept
+                    rows = checkpoint_store.page_rows(job_role,location,page_number) if checkpoint_store is not None else \
+                           list({row[0]:row for row in partial_rows.pop((job_role,location,page_number),[])}.values())
+                    if rows: yield job_role, location, page_number, rows
+    finally:
+        #Also runs if the caller stops iterating early (or raises), so that no chrome is left running. The units still queued are
+        #dropped first, so workers stop after the unit they are on, instead of scraping every queued page before their stop marker.
+        stop_event.set()
+        while True:
+            try:
+                task_queue.get_nowait()
+            except queue.Empty:
+                break
+        for _ in workers:
+            task_queue.put(None)
+        wait_profile = wait_profile if wait_profile is not None else WaitProfile()
+        #Results still queued (E.g. the caller stopped early) are read and dropped until every worker has sent its wait profile.
+        #A worker cannot exit while what it put on result_queue has not been read, so join would otherwise block forever.
+        wait_profiles_left = len(workers)
+        while wait_profiles_left:
+            try:
+                status, _, payload, _ = result_queue.get(timeout = 60)
+            except queue.Empty:
+                if not any(worker.is_alive() for worker in workers): break
+                continue
+            if status == "wait_profile":
+                wait_profile.extend(payload)
+                wait_profiles_left -= 1
+        for worker in workers:
+            worker.join()
+        wait_profile.save("wait_profile.csv")
+
+    if failed_units:
+        metrics.log(f"Units that failed after {MAX_ATTEMPTS_PER_UNIT} attempts: {failed_units}")
+
+def run_scrape_pool(job_roles: list, locations: list, number_of_workers: int, checkpoint_store: Optional[CheckpointStore] = None,\
+                    job_index: Optional[JobIndex] = None, company_cache: Optional[CompanyCache] = None,\
+                    parquet_writer = None, database = None, incremental: bool = False,\
+                    request_budget: Optional[RequestBudget] = None, metrics: Optional[Metrics] = None,\
+                    description_index = None) -> dict:
+    #Same as iter_scrape_pool, but returns a dictionary of (job_role, location) -> list of rows, in page order, at the end.
+    #If a parquet_writer (WS_Parquet_Writer.ParquetAppendWriter) is given, the rows of every page are written to it as soon as they come back.
+    #If a database (WS_Database.GlassdoorDatabase) is given, the rows of every page are upserted into it as soon as they come back.
+    #If incremental is True, only postings that are not in the database yet are extracted (see iter_scrape_pool).
+    #If a description_index (WS_Description_Index.DescriptionIndex) is given, the descriptions of every page are tokenized into it
+    #as soon as they come back, so skill counts are ready when the run ends.
+    if incremental and database is None:
+        raise ValueError("incremental scrapes need a database to compare the postings with")
+    pages_collected = {(job_role,location):{} for job_role in job_roles for location in locations}
+    for job_role, location, page_number, rows in iter_scrape_pool(job_roles,locations,number_of_workers,checkpoint_store,\
+                                                                  job_index,company_cache,database if incremental else None,\
+                                                                  request_budget,metrics = metrics):
+        pages_collected[(job_role,location)][page_number] = rows
+        if parquet_writer is not None:
+            parquet_writer.append(job_role,location,page_number,rows)
+        if database is not None:
+            database.upsert_rows(rows,job_role,location)
+        if description_index is not None:
+            description_index.add_rows(rows,job_role,location)
+
+    if checkpoint_store is not None:
+        return {key:checkpoint_store.load_rows(*key) for key in pages_collected}
+    return {key:[row for page_number in sorted(pages) for row in pages[page_number]] \
+            for key,pages in pages_collected.items()}
 
 # Looking at job roles from Singapore
 if __name__ == '__main__':
-    # My laptop has 8 cpu cores. Thus, we will only scrape up to 8 job roles at a time
-
     job_roles = ["Data Analyst","Machine Learning Engineer","Data Engineer","Database Administrator",\
-                         "Data Scientist","Data Architect","Software Engineer","Business Analyst"]
-    processes = [multiprocessing.Process(target = scrape_job_role, args = (job_role,"Singapore")) for \
-                job_role in job_roles]
-    for process in processes:
-        process.start()
-    for process in processes:
-        process.join()
-
-print("Completed scrapping")
-
-# After running this script, edit job_roles variable, to include only remaining job role(s), including Statistician. 
-# Then, run the script again.
\ No newline at end of file
+                         "Data Scientist","Data Architect","Software Engineer","Business Analyst","Statistician"]
+    locations = ["Singapore"]
+    # "selenium": Each worker is one headless chrome. The number of job roles no longer has to match the number of cpu cores.
+    # "http": One chrome logs in and finds the search urls, then all pages are fetched with httpx (see WS_Glassdoor_Http.py).
+    engine = "selenium"
+    number_of_workers = multiprocessing.cpu_count()
+    max_connections = 64
+    # The time of every stage, wait and retry of every worker is appended to metrics.jsonl. To follow the run while it is going:
+    # python WS_Metrics.py metrics.jsonl --follow 30
+    metrics = Metrics(f"{os.getcwd()}/metrics.jsonl")
+    # Requests per second shared by all workers (or all http connections). It goes up while requests go through, down when they are
+    # throttled, and every worker pauses when throttling keeps coming.
+    request_budget = RequestBudget(rate = 2, max_rate = 8, metrics = metrics)
+    # Checkpoints and job index claims only hold for one scrape date, so running the script again on the same day continues where
+    # the run stopped, and running it on the next day is a new scrape (which the incremental mode needs to refresh the postings).
+    # To continue a run that was stopped on an earlier day, set scrape_date to the day it started on.
+    scrape_date = datetime.date.today().isoformat()
+    # Rows and finished pages are saved into ./checkpoints/{scrape_date}. To start the scrape of the day again, delete that directory
+    # and job_index_{scrape_date}.db.
+    checkpoint_store = CheckpointStore(scrape_date = scrape_date)
+    # Postings are extracted only once across all job roles. The job roles each posting showed up under are saved into job_search_roles.csv
+    job_index = JobIndex(scrape_date = scrape_date)
+    # Company profiles are kept for 30 days in company_cache.db, and saved once into companies_extracted_data.csv
+    company_cache = CompanyCache(ttl_days = 30)
+    # "csv": One csv per job role at the end of the run.
+    # "parquet": A typed parquet dataset partitioned by job role, location and scrape date, written while the run is going
+    # (see WS_Parquet_Writer.py).
+    # "sqlite": Postings, companies and search roles upserted into glassdoor.db while the run is going, so scraping again
+    # the next day updates the same rows (see WS_Database.py).
+    output_format = "csv"
+    # Only with "sqlite" and the "selenium" engine: postings already in glassdoor.db are not opened again, and postings that are gone are marked closed.
+    # A daily refresh then only extracts the new postings.
+    incremental = False
+    # The skills asked for by every description are indexed into description_index.db while the run is going, so skill counts per
+    # job role and company, and which skills are asked for together, can be queried without reading the descriptions again
+    # (see WS_Description_Index.py). Set to None to skip it.
+    from WS_Description_Index import DescriptionIndex
+    description_index = DescriptionIndex()
+    parquet_writer = None
+    database = None
+    if output_format == "parquet":
+        from WS_Parquet_Writer import ParquetAppendWriter, write_parquet
+        parquet_writer = ParquetAppendWriter(scrape_date = scrape_date)
+    if output_format == "sqlite":
+        from WS_Database import GlassdoorDatabase
+        database = GlassdoorDatabase()
+
+    if engine == "http":
+        from WS_Glassdoor_Http import run_http_scrape
+        rows_collected = run_http_scrape(job_roles,locations,max_connections,company_cache,request_budget,metrics)
+        if parquet_writer is not None:
+            for (job_role,location),rows in rows_collected.items():
+                write_parquet(rows,job_role,location,scrape_date = scrape_date)
+        if database is not None:
+            for (job_role,location),rows in rows_collected.items():
+                database.upsert_rows(rows,job_role,location)
+        if description_index is not None:
+            for (job_role,location),rows in rows_collected.items():
+                description_index.add_rows(rows,job_role,location)
+    else:
+        rows_collected = run_scrape_pool(job_roles,locations,number_of_workers,checkpoint_store,job_index,company_cache,\
+                                         parquet_writer,database,incremental,request_budget,metrics,description_index)
+        job_index.search_roles().to_csv(f"{os.getcwd()}/job_search_roles.csv",index = False)
+        if database is not None:
+            database.upsert_search_roles(job_index.search_roles())
+        if description_index is not None:
+            description_index.add_search_roles(job_index.search_roles())
+    if output_format == "csv":
+        for job_role in job_roles:
+            save_rows_as_csv([row for location in locations for row in rows_collected[(job_role,location)]],job_role,company_cache)
+        save_companies_as_csv(company_cache)
+
+    print("Completed scrapping")
@@ -0,0 +1,48 @@
+"""
+Tests of the company profile cache (WS_Company_Cache.py) on a temporary sqlite file.
+
+Run with: python -m pytest test_WS_Company_Cache.py
+"""
+
+import time
+import WS_Company_Cache
+from WS_Company_Cache import CompanyCache, employer_key
+
+PROFILE = {"company_total_rating": "3.8", "proportion_reviewers_recommend_company": "70 %",
+           "company_individual_ratings": ["Career Opportunities", "3.6"],
+           "company_type_size_sector_industry_yearFounded": ["Company - Private", "51 to 200 Employees", None, None, "2010"]}
+EMPTY_PROFILE = {"company_total_rating": None, "proportion_reviewers_recommend_company": None,
+                 "company_individual_ratings": None, "company_type_size_sector_industry_yearFounded": [None]*5}
+
+def test_employer_key():
+    assert employer_key("VORO MOTORS3.8 ★") == "VORO MOTORS"
+    assert employer_key("\tTelstra3.9 ★") == "Telstra"
+
+def test_profile_is_shared_by_the_postings_of_the_company(tmp_path):
+    company_cache = CompanyCache(f"{tmp_path}/company_cache.db")
+    company_cache.put("VORO MOTORS3.8 ★",PROFILE)
+    assert company_cache.get("VORO MOTORS3.9 ★") == PROFILE
+    assert company_cache.get("Telstra") is None
+
+def test_expired_profile_is_missing(tmp_path, monkeypatch):
+    company_cache = CompanyCache(f"{tmp_path}/company_cache.db",ttl_days = 1)
+    company_cache.put("VORO MOTORS",PROFILE)
+    now = time.time()
+    monkeypatch.setattr(WS_Company_Cache.time,"time",lambda: now + 2*24*60*60)
+    assert company_cache.get("VORO MOTORS") is None
+
+def test_empty_profile_is_not_cached(tmp_path):
+    company_cache = CompanyCache(f"{tmp_path}/company_cache.db")
+    company_cache.put("VORO MOTORS",EMPTY_PROFILE)
+    assert company_cache.get("VORO MOTORS") is None
+    assert len(company_cache.companies()) == 0
+    company_cache.put("VORO MOTORS",PROFILE)
+    assert company_cache.get("VORO MOTORS") == PROFILE
+
+def test_empty_profile_cached_before_is_replaced(tmp_path):
+    company_cache = CompanyCache(f"{tmp_path}/company_cache.db")
+    with company_cache.connection() as connection:
+        connection.execute("INSERT INTO companies VALUES (?,?,?,?,?,?)",("VORO MOTORS",None,None,"null","[null, null, null, null, null]",time.time()))
+    assert company_cache.get("VORO MOTORS") is None
+    company_cache.put("VORO MOTORS",PROFILE)
+    assert company_cache.get("VORO MOTORS") == PROFILE
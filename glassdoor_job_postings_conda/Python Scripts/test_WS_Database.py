@@ -0,0 +1,67 @@
+"""
+Tests of the incremental scrape bookkeeping of GlassdoorDatabase (WS_Database.py) on a temporary sqlite file, over a few scrape days.
+
+Run with: python -m pytest test_WS_Database.py
+"""
+
+import pytest
+import pandas as pd
+from WS_Glassdoor_Driver import DATA_COLUMN_NAMES
+from WS_Database import GlassdoorDatabase, age_in_days
+
+DAY_1, DAY_2, DAY_3 = "2023-08-01", "2023-08-02", "2023-08-03"
+
+def make_row(job_id: str, job_age: str) -> list:
+    job_posting = dict.fromkeys(DATA_COLUMN_NAMES)
+    job_posting.update(job_id = job_id,job_name = f"Data Analyst {job_id}",job_age = job_age,company = "Company A3.8 ★",\
+                       company_total_rating = "3.8")
+    return [job_posting[column_name] for column_name in DATA_COLUMN_NAMES]
+
+def posting(database: GlassdoorDatabase, job_id: str) -> dict:
+    return database.lifetimes().set_index("job_id").loc[job_id].to_dict()
+
+@pytest.fixture
+def database(tmp_path):
+    #Postings 1, 2 and 3 were extracted from the Data Analyst (Singapore) search on day 1
+    database = GlassdoorDatabase(f"{tmp_path}/glassdoor.db")
+    database.upsert_rows([make_row("1","5d"),make_row("2","3d"),make_row("3","10d")],"Data Analyst","Singapore",DAY_1)
+    return database
+
+def test_age_in_days():
+    assert [age_in_days(job_age) for job_age in ["12h","5d","30d+",None,"new"]] == [0.5,5,30,None,None]
+
+def test_new_posting_is_extracted(database):
+    assert database.update_from_listing([("4","1d")],"Data Analyst","Singapore",DAY_2) == {"4"}
+    #Nothing is saved for it until it has been extracted
+    assert "4" not in set(database.lifetimes()["job_id"])
+
+def test_reposted_posting_is_extracted_again(database):
+    assert database.update_from_listing([("2","1d")],"Data Analyst","Singapore",DAY_2) == {"2"}
+
+def test_unchanged_posting_is_only_touched(database):
+    assert database.update_from_listing([("1","6d")],"Data Analyst","Singapore",DAY_2) == set()
+    assert posting(database,"1")["scrape_date"] == DAY_2
+    assert posting(database,"1")["first_scrape_date"] == DAY_1
+    assert database.postings(job_role = "Data Analyst").set_index("job_id").loc["1","job_age"] == "6d"
+
+def test_posting_under_another_search_is_only_touched(database):
+    assert database.update_from_listing([("1","6d")],"Data Engineer","Singapore",DAY_2) == set()
+    assert set(database.postings(job_role = "Data Engineer")["job_id"]) == {"1"}
+
+def test_missing_posting_is_closed_then_reopened(database):
+    #Posting 3 is gone on day 2. Posting 1 is only seen under another search, so it is still open.
+    database.update_from_listing([("2","4d")],"Data Analyst","Singapore",DAY_2)
+    database.update_from_listing([("1","6d")],"Data Engineer","Singapore",DAY_2)
+    assert database.close_missing_postings("Data Analyst","Singapore",DAY_2) == 1
+    assert posting(database,"3")["closed_date"] == DAY_2
+    assert posting(database,"3")["lifetime_days"] == 1
+    assert pd.isna(posting(database,"1")["closed_date"])
+    #Closing again on the same day does not change anything
+    assert database.close_missing_postings("Data Analyst","Singapore",DAY_2) == 0
+
+    #Posting 3 shows up again on day 3, and is not extracted again since it was not reposted
+    assert database.update_from_listing([("3","12d")],"Data Analyst","Singapore",DAY_3) == set()
+    assert pd.isna(posting(database,"3")["closed_date"])
+    assert posting(database,"3")["scrape_date"] == DAY_3
+    assert database.close_missing_postings("Data Analyst","Singapore",DAY_3) == 2
+    assert pd.isna(posting(database,"3")["closed_date"])
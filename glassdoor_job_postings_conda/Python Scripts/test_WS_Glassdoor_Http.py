@@ -0,0 +1,65 @@
+"""
+Offline tests of the http engine (WS_Glassdoor_Http.py). The job postings below are served as html by a local ReplayServer, which uses
+the same element ids and class names as glassdoor, so no network and no chrome are needed.
+
+Run with: python -m pytest test_WS_Glassdoor_Http.py
+"""
+
+import asyncio
+import httpx
+from parsel import Selector
+from WS_Glassdoor_Http import GlassdoorHttpClient, parse_job_posting, parse_listing, parse_page_numbers
+from WS_Replay_Server import ReplayServer, render_article, page
+from WS_Metrics import Metrics, load_events, summarize
+
+POSTINGS = {"data analyst": [[f"100{i}", f"Data Analyst {i}", "Singapore", f"{i + 1}d",
+                              "We are looking for a Data Analyst.\nExperience with SQL and Python.",
+                              "SGD 4K - SGD 6K (Employer est.)", "(Employer est.)", f"Company {i}\n4.1 ★", "4.1", "80%",
+                              ["3.9", "3.5", "4.0", "3.8", "3.7"], ["Company - Private", "51 to 200 Employees", None, None, "2010"]]
+                             for i in range(7)]}
+POSTINGS["data analyst"][1][5:7] = [None, None] #No salary
+POSTINGS["data analyst"][2][10] = None #No individual ratings
+
+def test_parse_job_posting():
+    for row in POSTINGS["data analyst"]:
+        selector = Selector(text = page(row[1],f'<div id="JDCol">{render_article(row)}</div>'))
+        assert parse_job_posting(selector,row[3]) == [field.replace("\n"," ") if column == 7 else field for (column,field) in enumerate(row)]
+
+def test_parse_listing():
+    with ReplayServer(POSTINGS,postings_per_page = 3) as replay_server:
+        url = replay_server.search_url("Data Analyst","Singapore")
+        selector = Selector(text = httpx.get(url).text)
+        assert parse_page_numbers(selector) == (1,3)
+        assert parse_listing(selector,url) == [(row[0],row[3],f"{replay_server.url}job-listing/?jl={row[0]}") for \
+                                               row in POSTINGS["data analyst"][:3]]
+
+def test_scrape_search():
+    with ReplayServer(POSTINGS,postings_per_page = 3) as replay_server:
+        async def scrape():
+            async with GlassdoorHttpClient() as http_client:
+                return await http_client.scrape_search(replay_server.search_url("Data Analyst","Singapore"))
+        rows = asyncio.run(scrape())
+    assert [row[0] for row in rows] == [row[0] for row in POSTINGS["data analyst"]]
+
+def test_failed_job_posting_keeps_the_other_rows(tmp_path):
+    class FailingHttpClient(GlassdoorHttpClient):
+        async def fetch(self,url: str, retries: int = 3, site: str = "page-load"):
+            if url.endswith("jl=1004"): raise httpx.HTTPStatusError("503",request = httpx.Request("GET",url),response = httpx.Response(503))
+            return await super().fetch(url,retries,site)
+
+    metrics = Metrics(f"{tmp_path}/metrics.jsonl",echo = False)
+    with ReplayServer(POSTINGS,postings_per_page = 3) as replay_server:
+        async def scrape():
+            async with FailingHttpClient(metrics = metrics) as http_client:
+                return await http_client.scrape_search(replay_server.search_url("Data Analyst","Singapore"),"Data Analyst","Singapore")
+        rows = asyncio.run(scrape())
+    assert [row[0] for row in rows] == [row[0] for row in POSTINGS["data analyst"] if row[0] != "1004"]
+
+    #The skipped posting is in the metrics, like the postings, pages and fetches that went through
+    events = load_events(f"{tmp_path}/metrics.jsonl")
+    assert events[events["status"] == "failed"]["job_id"].tolist() == ["1004"]
+    summary = summarize(events)
+    assert summary["progress"]["postings"] == 6
+    assert summary["progress"]["pages_passed"] == 3
+    assert summary["stages"].loc["page-load","count"] == 3
+    assert summary["stages"].loc["job-posting-load","count"] == 6
@@ -0,0 +1,36 @@
+"""
+Tests of the parquet dataset writer (WS_Parquet_Writer.py) on a temporary directory.
+
+Run with: python -m pytest test_WS_Parquet_Writer.py
+"""
+
+import pandas as pd
+from WS_Parquet_Writer import ParquetAppendWriter, write_parquet, salary_bounds, company_overview
+
+def make_rows(job_ids: list) -> list:
+    return [[job_id, "Data Analyst", "Singapore", "3d", "SQL and Python", "SGD 4K - SGD 6K (Employer est.)", "(Employer est.)",
+             "Company A", "4.1", "80 %", ["Career Opportunities", "3.9"], ["Company - Private", "51 to 200 Employees", None, None, "2010"]]
+            for job_id in job_ids]
+
+def read_job_ids(root_path) -> list:
+    return sorted(pd.read_parquet(root_path,columns = ["job_id"])["job_id"])
+
+def test_typed_columns():
+    assert salary_bounds("SGD 50K - SGD 55K (Employer est.)") == (50000.0,55000.0)
+    assert company_overview(["Company - Private", "51 to 200 Employees", None, None, "Founded in 2010"])["year_founded"] == 2010
+    assert company_overview([None]*5) is None
+
+def test_writing_a_page_again_replaces_it(tmp_path):
+    parquet_writer = ParquetAppendWriter(str(tmp_path),scrape_date = "2023-08-01")
+    parquet_writer.append("Data Analyst","Singapore",1,make_rows(["1","2"]))
+    parquet_writer.append("Data Analyst","Singapore",2,make_rows(["3"]))
+    #A resumed run yields its finished pages again
+    parquet_writer.append("Data Analyst","Singapore",1,make_rows(["1","2"]))
+    parquet_writer.append("Data Analyst","Singapore",2,make_rows(["3","4"]))
+    assert read_job_ids(tmp_path) == ["1","2","3","4"]
+
+def test_writing_a_search_again_replaces_it(tmp_path):
+    write_parquet(make_rows(["1","2"]),"Data Analyst","Singapore",str(tmp_path),"2023-08-01")
+    write_parquet(make_rows(["1","2","3"]),"Data Analyst","Singapore",str(tmp_path),"2023-08-01")
+    write_parquet(make_rows(["4"]),"Data Engineer","Singapore",str(tmp_path),"2023-08-01")
+    assert read_job_ids(tmp_path) == ["1","2","3","4"]
@@ -0,0 +1,154 @@
+"""
+Tests of the shared request budget (WS_Rate_Limiter.py). The clock of the module is replaced, so pauses and windows are crossed
+without sleeping.
+
+Run with: python -m pytest test_WS_Rate_Limiter.py
+"""
+
+import pytest
+import WS_Rate_Limiter
+from WS_Rate_Limiter import RequestBudget
+from WS_Metrics import Metrics
+
+class Clock:
+    def __init__(self):
+        self.now = 1000000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self,seconds: float):
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(WS_Rate_Limiter.time,"time",clock)
+    return clock
+
+def make_budget(**kwargs) -> RequestBudget:
+    settings = dict(rate = 8, burst = 5, max_rate = 8, failure_threshold = 5, pause_seconds = 60, decrease_window_seconds = 10,\
+                    metrics = Metrics(echo = False))
+    settings.update(kwargs)
+    return RequestBudget(**settings)
+
+def open_circuit(budget: RequestBudget, clock: Clock):
+    #failure_threshold throttled requests in a row, each in its own decrease window
+    for _ in range(budget.failure_threshold):
+        budget.record_failure()
+        clock.advance(budget.decrease_window_seconds)
+
+def test_tokens_are_refilled_at_the_rate(clock):
+    budget = make_budget(rate = 2)
+    assert [budget.reserve() for _ in range(5)] == [0]*5
+    assert budget.reserve() == pytest.approx(0.5)
+    clock.advance(0.5)
+    assert budget.reserve() == 0
+
+def test_circuit_opens_after_failure_threshold(clock):
+    budget = make_budget()
+    for _ in range(budget.failure_threshold - 1):
+        budget.record_failure()
+    assert not budget.is_open()
+    #A success resets the count
+    budget.record_success(0.1)
+    open_circuit(budget,clock)
+    assert budget.is_open()
+    assert budget.reserve() > 0
+
+def test_failures_that_are_not_throttling_do_not_count(clock):
+    budget = make_budget()
+    for _ in range(2*budget.failure_threshold):
+        budget.record_failure(throttled = False)
+    assert not budget.is_open()
+    assert budget.rate() == 8
+
+def test_failures_are_ignored_while_open(clock):
+    budget = make_budget()
+    open_circuit(budget,clock)
+    rate = budget.rate()
+    #Requests that were already sent when the circuit opened
+    for _ in range(budget.failure_threshold):
+        clock.advance(budget.decrease_window_seconds)
+        budget.record_failure()
+    assert budget.rate() == rate
+    assert budget.state[WS_Rate_Limiter.PAUSE_SECONDS] == 60
+    #Failures after the pause but before the probe is sent are also late
+    clock.advance(60)
+    budget.record_failure()
+    assert not budget.is_open()
+    assert budget.rate() == rate
+
+def test_only_one_probe_goes_through(clock):
+    budget = make_budget()
+    open_circuit(budget,clock)
+    clock.advance(60)
+    assert budget.reserve() == 0
+    assert budget.reserve() > 0
+    clock.advance(1)
+    assert budget.reserve() > 0
+    #If the probe does not report back, another request becomes the probe
+    clock.advance(budget.probe_timeout_seconds)
+    assert budget.reserve() == 0
+
+def test_successful_probe_closes_the_circuit(clock):
+    budget = make_budget()
+    open_circuit(budget,clock)
+    clock.advance(60)
+    assert budget.reserve() == 0
+    budget.record_success(0.1)
+    assert budget.state[WS_Rate_Limiter.HALF_OPEN] == 0
+    clock.advance(1)
+    assert [budget.reserve() for _ in range(3)] == [0]*3
+
+def test_probe_that_is_not_throttled_closes_the_circuit(clock):
+    budget = make_budget()
+    open_circuit(budget,clock)
+    clock.advance(60)
+    budget.reserve()
+    budget.record_failure(throttled = False)
+    assert budget.state[WS_Rate_Limiter.HALF_OPEN] == 0
+
+def test_throttled_probe_reopens_the_circuit_for_longer(clock):
+    budget = make_budget(max_pause_seconds = 200)
+    open_circuit(budget,clock)
+    for pause_seconds in [120,200,200]:
+        clock.advance(budget.state[WS_Rate_Limiter.PAUSE_SECONDS])
+        assert budget.reserve() == 0
+        budget.record_failure()
+        assert budget.is_open()
+        assert budget.state[WS_Rate_Limiter.PAUSE_SECONDS] == pause_seconds
+    clock.advance(200)
+    budget.reserve()
+    budget.record_success(0.1)
+    assert budget.state[WS_Rate_Limiter.PAUSE_SECONDS] == 60
+
+def test_rate_is_lowered_once_per_decrease_window(clock):
+    budget = make_budget(failure_threshold = 100)
+    #A burst of requests sent together that all failed
+    for _ in range(10):
+        budget.record_failure()
+    assert budget.rate() == 4
+    clock.advance(5)
+    budget.record_failure()
+    assert budget.rate() == 4
+    clock.advance(5)
+    budget.record_failure()
+    assert budget.rate() == 2
+    #Slow successes share the same window
+    budget.record_success(budget.slow_seconds + 1)
+    assert budget.rate() == 2
+    clock.advance(10)
+    budget.record_success(budget.slow_seconds + 1)
+    assert budget.rate() == pytest.approx(1.8)
+
+def test_rate_goes_back_up_to_max_rate(clock):
+    budget = make_budget(rate = 1, increase = 0.5)
+    for _ in range(20):
+        budget.record_success(0.1)
+    assert budget.rate() == 8
+    budget = make_budget(rate = 0.2, min_rate = 0.1, failure_threshold = 100)
+    for _ in range(3):
+        budget.record_failure()
+        clock.advance(10)
+    assert budget.rate() == 0.1
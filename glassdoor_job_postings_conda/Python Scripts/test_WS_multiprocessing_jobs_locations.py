@@ -0,0 +1,77 @@
+"""
+Tests of the worker pool (WS_multiprocessing_jobs_locations.py) with stub drivers instead of chrome. The workers are forked, so the
+stub replaces start_glassdoor_driver in the workers too. Every page a stub scrapes is appended to a log file, to count them.
+
+Run with: python -m pytest test_WS_multiprocessing_jobs_locations.py
+"""
+
+import os
+import time
+import multiprocessing
+import pytest
+import WS_multiprocessing_jobs_locations as pool
+from WS_Glassdoor_Driver import DATA_COLUMN_NAMES
+from WS_Checkpoint import CheckpointStore
+from WS_Metrics import Metrics
+
+class StubDriver:
+    def __init__(self,log_path: str, last_page_number: int, seconds: float):
+        self.log_path = log_path
+        self.last_page_number = last_page_number
+        self.seconds = seconds
+        self.checkpoint_store = self.job_index = self.company_cache = self.incremental_database = self.request_budget = None
+        self.data = []
+
+    def scrape_page(self,job_role: str, location: str, page_number: int, on_last_page_number = None):
+        if on_last_page_number is not None: on_last_page_number(self.last_page_number)
+        time.sleep(self.seconds)
+        self.data = [[f"{job_role}-{page_number}-{i}"] + [None]*(len(DATA_COLUMN_NAMES) - 1) for i in range(2)]
+        for row in self.data:
+            if self.checkpoint_store is not None: self.checkpoint_store.append_row(job_role,location,page_number,row)
+        with open(self.log_path,"a") as f:
+            f.write(f"{page_number}\n")
+        return self.data,self.last_page_number
+
+    def get_screenshot_as_file(self,file_name: str):
+        pass
+
+    def quit(self):
+        pass
+
+@pytest.fixture
+def scraped_pages(tmp_path, monkeypatch):
+    #Returns a function that sets up the stub drivers and returns the pages they scraped so far
+    if "fork" not in multiprocessing.get_all_start_methods(): pytest.skip("needs fork to hand the stub driver to the workers")
+    monkeypatch.setattr(multiprocessing,"Process",multiprocessing.get_context("fork").Process)
+    monkeypatch.chdir(tmp_path) #wait_profile.csv is saved into the current working directory
+    log_path = f"{tmp_path}/scraped_pages.log"
+    def setup(last_page_number: int, seconds: float = 0):
+        monkeypatch.setattr(pool,"start_glassdoor_driver",lambda wait_profile = None, metrics = None: \
+                            StubDriver(log_path,last_page_number,seconds))
+        return lambda: [int(line) for line in open(log_path)] if os.path.exists(log_path) else []
+    return setup
+
+def test_every_page_is_scraped_once(scraped_pages):
+    get_scraped_pages = scraped_pages(last_page_number = 6)
+    pages = [page_number for (_,_,page_number,_) in pool.iter_scrape_pool(["Data Analyst"],["Singapore"],3,metrics = Metrics(echo = False))]
+    assert sorted(pages) == sorted(get_scraped_pages()) == list(range(1,7))
+
+def test_resume_scrapes_every_unfinished_page_once(scraped_pages, tmp_path):
+    #An earlier run knows that there are 6 pages, and only finished page 3
+    get_scraped_pages = scraped_pages(last_page_number = 6)
+    checkpoint_store = CheckpointStore(directory = f"{tmp_path}/checkpoints")
+    checkpoint_store.append_row("Data Analyst","Singapore",3,["Data Analyst-3-0"] + [None]*(len(DATA_COLUMN_NAMES) - 1))
+    checkpoint_store.finish_page("Data Analyst","Singapore",3,6)
+    pages = [page_number for (_,_,page_number,_) in pool.iter_scrape_pool(["Data Analyst"],["Singapore"],3,checkpoint_store = checkpoint_store,\
+                                                                          metrics = Metrics(echo = False))]
+    assert sorted(pages) == list(range(1,7))
+    assert sorted(get_scraped_pages()) == [1,2,4,5,6]
+    assert checkpoint_store.is_finished("Data Analyst","Singapore")
+
+def test_stopping_early_drops_the_queued_pages(scraped_pages):
+    get_scraped_pages = scraped_pages(last_page_number = 40,seconds = 0.05)
+    pages = pool.iter_scrape_pool(["Data Analyst"],["Singapore"],2,metrics = Metrics(echo = False))
+    next(pages)
+    pages.close()
+    #Only the units the workers were on when the pool stopped are finished
+    assert len(get_scraped_pages()) < 10